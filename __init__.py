@@ -1,4 +1,25 @@
 from textobjects.lib import *
-from textobjects.collections import *
 from textobjects.textobject import StructuredText
 
+_collections = ('ChainSequence', 'PageView', 'Page', 'PageMap', 'File', 'Document',
+                'Archive', 'open', 'glob', 'aopen', 'aglob')
+"""names from :mod:`textobjects.collections`, which is imported when one is first used"""
+
+_submodules = ('aio', 'cache', 'codegen', 'collections', 'compressed', 'documents', 'index',
+               'interning', 'nodes', 'piecetable', 'profiling', 'rendering', 'storage',
+               'templates')
+"""modules which are imported when they are first used as an attribute of the package"""
+
+__all__ = [name for name in globals() if not name.startswith('_')] + list(_collections)
+"""``from textobjects import *`` also imports the names from :mod:`textobjects.collections`"""
+
+def __getattr__(name):
+    import importlib
+    if name in _collections:
+        return getattr(importlib.import_module('textobjects.collections'), name)
+    if name in _submodules:
+        return importlib.import_module(f'textobjects.{name}')
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+def __dir__():
+    return sorted(set(globals()) | set(_collections) | set(_submodules))
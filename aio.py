@@ -0,0 +1,102 @@
+"""asyncio support shared by the async variants of the library
+
+blocking file reads and writes are offloaded to a bounded thread pool,
+and blocking iterators are turned into async iterators which apply
+backpressure to the thread producing the items
+"""
+import asyncio
+import threading
+
+IO_WORKERS = 8
+"""The maximum number of threads used for file reads and writes"""
+
+STREAM_BUFFER = 64
+"""The number of items a producer can get ahead of the consumer of a :func:`stream`"""
+
+IO_THREAD_PREFIX = 'textobjects-io'
+"""The name of each thread of the :func:`io_executor`"""
+
+_io_executor = None
+_lock = threading.Lock()
+
+def io_executor():
+    """the shared, bounded executor which blocking I/O is run in"""
+    global _io_executor
+    with _lock:
+        if _io_executor is None:
+            from concurrent import futures
+            _io_executor = futures.ThreadPoolExecutor(
+                    IO_WORKERS, thread_name_prefix=IO_THREAD_PREFIX)
+    return _io_executor
+
+def on_io_worker():
+    """True if the calling thread is one of the threads of the :func:`io_executor`"""
+    return threading.current_thread().name.startswith(IO_THREAD_PREFIX)
+
+def io_map(func, iterable):
+    """`func` applied to each item in the :func:`io_executor`. When called from
+    one of it's threads, eg. by a function given to :func:`run`, the items are
+    mapped in the calling thread instead, as waiting on the bounded pool from
+    within it can deadlock once every worker is waiting
+
+    Returns:
+        (Iterator) the results, in order
+    """
+    if on_io_worker():
+        return map(func, iterable)
+    return io_executor().map(func, iterable)
+
+async def run(func, *args, executor=None):
+    """run `func(*args)` in the `executor` without blocking the event loop
+
+    Args:
+        func (Callable): the blocking function
+        executor (concurrent.futures.Executor): where to run the function,
+            the shared :func:`io_executor` if None is given
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor or io_executor(), func, *args)
+
+async def stream(iterable, executor=None, maxsize=STREAM_BUFFER):
+    """iterate a blocking iterable from a worker thread, yielding the items
+    as they are produced. The worker waits whenever `maxsize` items are
+    waiting to be consumed
+
+    Args:
+        iterable (Iterable): the blocking iterable, it is only iterated in the worker
+        executor (concurrent.futures.Executor): a thread based executor to iterate
+            in, the shared :func:`io_executor` if None is given
+        maxsize (int): the number of items which can be buffered
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize)
+    done = object()
+    cancelled = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if cancelled.is_set():
+                    return
+                asyncio.run_coroutine_threadsafe(queue.put((item, None)), loop).result()
+        except BaseException as e:
+            asyncio.run_coroutine_threadsafe(queue.put((done, e)), loop).result()
+        else:
+            asyncio.run_coroutine_threadsafe(queue.put((done, None)), loop).result()
+
+    producer = loop.run_in_executor(executor or io_executor(), produce)
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is done:
+                if error:
+                    raise error
+                break
+            yield item
+    finally:
+        cancelled.set()
+        while not producer.done():
+            # make room for a producer which is waiting on a full queue
+            while not queue.empty():
+                queue.get_nowait()
+            await asyncio.wait([producer], timeout=0.01)
@@ -0,0 +1,185 @@
+"""benchmarks for matching, searching and storage, using pytest-benchmark
+
+run with::
+
+    pytest -p no:cacheprovider textobjects/benchmarks.py
+
+The corpora are generated locally from a fixed seed. By default only the small
+corpus is used, set :obj:`SIZES_VARIABLE` to a comma separated list of the
+:obj:`SIZES` to run the larger ones, eg. ``TEXTOBJECTS_BENCH_SIZES=small,10MB``.
+Each benchmark reports it's throughput (MB/s) and the peak memory of a single
+run (bytes), measured with tracemalloc, in the `extra_info` of the results
+"""
+import os
+import random
+import tracemalloc
+import pytest
+import textobjects
+from textobjects import regex
+from textobjects.documents import Page
+from textobjects.storage import TextObjectStorage
+
+pytest.importorskip('pytest_benchmark')
+
+SIZES = {'small': 64 * 1024, '10MB': 10 * 1024 ** 2, '100MB': 100 * 1024 ** 2}
+"""The size of each corpus in characters"""
+
+SIZES_VARIABLE = 'TEXTOBJECTS_BENCH_SIZES'
+"""The environment variable which selects the corpus sizes to run"""
+
+SEED = 20201019
+"""The seed for generating the corpora, so that runs are comparable"""
+
+TEMPLATES = {
+    'plain': r'<key:\w+> = <value:\w+>',
+    'optional': r'TODO: <priority:\(\w\) :?><item:.*>$',
+    'repeat': r'tags:<tags: \w+,?:!>',
+    'search': r'note:<word:\d+:/>',
+    'nested': r'<pair:<key:\w+> = <value:\w+>>',
+    'interpolation': r'<key:\w+> = <value:\w+`!attrs["seen"] = True`>',
+}
+"""Templates in order of increasing complexity, the interpolation template
+can only be evaluated by the node backend"""
+
+NODE_BACKEND_LIMIT = 4 * 1024
+"""The node backend evaluates the remaining text for each prospective match, so
+the corpus for templates which are not lowered to a regex is cut to this many characters"""
+
+SETUP_ROUNDS = 20
+"""The number of rounds of a small benchmark which needs a fresh setup for each round"""
+
+WORDS = ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'eta', 'theta', 'iota', 'kappa']
+
+def sizes():
+    names = os.environ.get(SIZES_VARIABLE, 'small').split(',')
+    return [name.strip() for name in names if name.strip()]
+
+def line(rng):
+    """a line of the corpus, each of the templates matches some of the lines"""
+    words = rng.choices(WORDS, k=rng.randint(1, 6))
+    kind = rng.randrange(4)
+    if kind == 0:
+        return f'{words[0]} = {rng.choice(WORDS)}{rng.randrange(1000)}'
+    if kind == 1:
+        priority = f'({rng.choice("ABC")}) ' if rng.random() < 0.5 else ''
+        return f'TODO: {priority}{" ".join(words)}'
+    if kind == 2:
+        return 'tags: ' + ', '.join(words)
+    return f'note: {" ".join(words)} {rng.randrange(100)}'
+
+_corpora = {}
+
+def corpus(size):
+    """the generated text for one of the :obj:`SIZES`"""
+    if size not in _corpora:
+        rng = random.Random(SEED)
+        lines, length = [], 0
+        while length < SIZES[size]:
+            lines.append(line(rng))
+            length += len(lines[-1]) + 1
+        _corpora[size] = '\n'.join(lines) + '\n'
+    return _corpora[size]
+
+def text(Type, size):
+    """the corpus for `size`, cut to :obj:`NODE_BACKEND_LIMIT` at a line
+    boundary when `Type` uses the node backend"""
+    text = corpus(size)
+    if issubclass(Type, regex.RegexTextObject) or len(text) <= NODE_BACKEND_LIMIT:
+        return text
+    return text[:text.rindex('\n', 0, NODE_BACKEND_LIMIT) + 1]
+
+_types = {}
+
+def textobjecttype(name):
+    """the class for one of the :obj:`TEMPLATES`, from the regex backend when
+    the template can be lowered and otherwise from the node backend"""
+    if name not in _types:
+        template = TEMPLATES[name]
+        backend = 'regex' if regex.supports(template) else 'nodes'
+        _types[name] = textobjects.create(f'Bench{name.title()}', template, backend=backend)
+    return _types[name]
+
+def run(benchmark, size, func, *args, length=None, setup=None):
+    """benchmark `func(*args)`, recording the throughput over `length` characters,
+    the corpus for `size` by default, and the peak memory of a single call.
+    The larger corpora are only run once. For a `func` which changes it's
+    arguments, `setup` produces fresh arguments before each round, it is not timed"""
+    tracemalloc.start()
+    try:
+        func(*(setup() if setup else args))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    rounds = SETUP_ROUNDS if size == 'small' else 1
+    if setup is not None:
+        result = benchmark.pedantic(func, setup=lambda: (setup(), {}), rounds=rounds, iterations=1)
+    elif size == 'small':
+        result = benchmark(func, *args)
+    else:
+        result = benchmark.pedantic(func, args, rounds=1, iterations=1)
+    benchmark.extra_info['peak_bytes'] = peak
+    if benchmark.stats: # None when benchmarking is disabled
+        benchmark.extra_info['MB/s'] = (length or len(corpus(size))) / 1024 ** 2 / benchmark.stats.stats.mean
+    return result
+
+@pytest.fixture(params=sizes())
+def size(request):
+    if request.param not in SIZES:
+        pytest.fail(f'{request.param!r} is not one of {list(SIZES)}')
+    return request.param
+
+@pytest.fixture(params=list(TEMPLATES))
+def template(request):
+    return request.param
+
+def test_match(benchmark, template):
+    Type = textobjecttype(template)
+    lines = [l for l in corpus('small').split('\n') if textobjects.matchlines(Type, l)][:100]
+
+    def matchall():
+        for l in lines:
+            textobjects.match(Type, l)
+
+    run(benchmark, 'small', matchall, length=sum(map(len, lines)))
+
+def test_search(benchmark, size, template):
+    Type = textobjecttype(template)
+    corpus = text(Type, size)
+    run(benchmark, size, textobjects.search, Type, corpus, length=len(corpus))
+
+def test_findall(benchmark, size, template):
+    Type = textobjecttype(template)
+    corpus = text(Type, size)
+    assert run(benchmark, size, textobjects.findall, Type, corpus, length=len(corpus))
+
+def test_matchlines(benchmark, size, template):
+    Type = textobjecttype(template)
+    corpus = text(Type, size)
+    assert run(benchmark, size, textobjects.matchlines, Type, corpus, length=len(corpus))
+
+def test_searchlines(benchmark, size, template):
+    Type = textobjecttype(template)
+    corpus = text(Type, size)
+    assert run(benchmark, size, textobjects.searchlines, Type, corpus, length=len(corpus))
+
+def test_page_edits(benchmark, size):
+    # each edit is spliced into the text of the page through it's PieceTable
+    Type = textobjecttype('plain')
+
+    def setup():
+        return (Page(corpus(size), Type),)
+
+    def edit(page):
+        for i in range(0, len(page), max(1, len(page) // 100)):
+            page[i] = Type(f'omega = omega{i}')
+        page.insert(len(page) // 2, Type('omega = inserted'))
+        del page[len(page) // 2]
+        return page.data
+
+    assert run(benchmark, size, edit, setup=setup)
+
+def test_storage_update(benchmark, size, tmp_path):
+    path = tmp_path / 'storage.txt'
+    path.write_text(corpus(size))
+    store = TextObjectStorage([textobjecttype('plain'), textobjecttype('optional')], path)
+    run(benchmark, size, store.update)
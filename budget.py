@@ -0,0 +1,71 @@
+"""limits on the work done by a single match, for untrusted templates and text
+
+A :class:`Budget` is given to the matching functions, eg.
+``textobjects.findall(Type, text, budget=Budget(steps=10000, timeout=0.5))``.
+The evaluation checks it cooperatively: the node backend and the generated
+code check it each time a node is evaluated, and the regex backend checks it
+between matches. A single regular expression match, or a single python
+interpolation block, can not be interrupted
+"""
+from time import monotonic
+from textobjects.exceptions import BudgetExceeded
+
+class Budget:
+    """The steps and/or time a match is allowed to take
+
+    Args:
+        steps (int): the maximum number of evaluation steps, unlimited if None
+        timeout (float): the maximum number of seconds, unlimited if None
+    """
+    __slots__ = ('steps', 'timeout', 'used', 'deadline', 'started', 'index')
+
+    def __init__(self, steps=None, timeout=None):
+        self.steps = steps
+        self.timeout = timeout
+        self.used = 0
+        """the steps taken so far"""
+        self.started = None
+        """when the budget was started, None until :func:`start` is called"""
+        self.deadline = None
+        self.index = 0
+        """the furthest position in the text which was reached"""
+
+    def __repr__(self):
+        return f'Budget(steps={self.steps}, timeout={self.timeout})'
+
+    def __deepcopy__(self, memo):
+        # the copies of the context made by EitherNode spend the same budget
+        return self
+
+    def start(self):
+        """a running copy of the budget, which is spent by a single call.
+        A budget which is already running is returned as is, so that it
+        can be shared by several calls"""
+        if self.started is not None:
+            return self
+        running = Budget(self.steps, self.timeout)
+        running.started = monotonic()
+        if self.timeout is not None:
+            running.deadline = running.started + self.timeout
+        return running
+
+    def spend(self, index=None):
+        """take a step at `index`
+
+        Raises:
+            (BudgetExceeded) when the steps or the time have run out
+        """
+        self.used += 1
+        if index is not None and index > self.index:
+            self.index = index
+        if self.steps is not None and self.used > self.steps:
+            raise self.exceeded('steps')
+        if self.deadline is not None and monotonic() > self.deadline:
+            raise self.exceeded('timeout')
+
+    def exceeded(self, reason, partial=None):
+        return BudgetExceeded(reason, self.used, monotonic() - self.started, self.index, partial)
+
+def start(budget):
+    """start the budget, if there is one"""
+    return budget.start() if budget is not None else None
@@ -0,0 +1,204 @@
+"""a content addressed cache of the results of matching
+
+The results are stored under a key made from a fingerprint of the template
+and a hash of the text, so running the same templates over text which has
+not changed costs a hash and unpickling the stored results::
+
+    results = cache.ResultCache(directory='~/.cache/textobjects')
+    found = textobjects.findall(Todo, text, cache=results)
+    page = documents.Page(text, Todo, find=results.findall)
+
+The results are pickled as described in :mod:`textobjects.textobject`, without
+the text they were found in, which is attached again when they are loaded. Like
+unpickled results they have no `matches` or `matchdict`, and `post` is not called
+for them again. Recently used results are kept in memory, and if a directory is
+given all of them are also kept on disk, where the least recently used are removed
+once the files take more than `max_bytes`. Only classes created from a template
+without interpolation blocks are cached, other classes are matched as usual
+"""
+import os
+import pickle
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from textobjects.textobject import TextObject
+from textobjects.exceptions import TemplateMatchError
+
+MEMORY_ENTRIES = 128
+"""The number of results kept in memory by default"""
+
+DISK_BYTES = 256 * 1024 ** 2
+"""The size of the results kept on disk by default"""
+
+VERSION = 1
+"""Part of every key, changed when the format of the stored results changes"""
+
+_NOMATCH = b''
+"""stored for a :func:`match` which raised :class:`TemplateMatchError`"""
+
+def fingerprint(Type):
+    """what identifies the results of a class, or None if it can not be cached"""
+    attrs = Type.__dict__
+    template = attrs.get('__template__')
+    if template is None or '`' in template:
+        return None
+    return repr((VERSION, Type.__name__, template, attrs.get('__backend__'),
+                 attrs.get('__memoize__'), getattr(Type, 'encoding', None)))
+
+def digest(text):
+    """the hash of the text, which can be a str or bytes-like"""
+    data = text.encode('utf-8', 'surrogatepass') if isinstance(text, str) else text
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+def attach(obj, text):
+    """set the text of the object and of the objects within it"""
+    if isinstance(obj, TextObject):
+        if obj.__dict__.get('enclosing_text') is None:
+            obj.enclosing_text = text
+        for value in obj.__dict__.values():
+            if isinstance(value, TextObject):
+                attach(value, text)
+    if isinstance(obj, list) or hasattr(obj, 'data') and isinstance(obj.data, list):
+        for item in obj:
+            attach(item, text)
+    return obj
+
+class ResultCache:
+    """Results of matching, by template and text
+
+    Args:
+        maxsize (int): the number of results to keep in memory
+        directory (str): where to keep the results on disk, they are only kept
+            in memory if None is given
+        max_bytes (int): the size the results on disk are kept within
+    """
+    def __init__(self, maxsize=MEMORY_ENTRIES, directory=None, max_bytes=DISK_BYTES):
+        self.maxsize = maxsize
+        self.directory = Path(directory).expanduser() if directory is not None else None
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        self.__memory = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__disksize = 0
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.__disksize = sum(p.stat().st_size for p in self.directory.glob('*.pickle'))
+
+    def key(self, Type, operation, text):
+        """the key of the results of `operation` for `Type` in the text,
+        None if the class can not be cached"""
+        fp = fingerprint(Type)
+        if fp is None:
+            return None
+        return hashlib.blake2b(f'{fp}{operation}{digest(text)}'.encode(), digest_size=20).hexdigest()
+
+    def get(self, key):
+        """the stored results for the key, or None"""
+        with self.__lock:
+            data = self.__memory.get(key)
+            if data is not None:
+                self.__memory.move_to_end(key)
+                return data
+        if self.directory is None:
+            return None
+        path = self.directory / f'{key}.pickle'
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            return None
+        self.__remember(key, data)
+        return data
+
+    def put(self, key, data):
+        """store the pickled results for the key"""
+        self.__remember(key, data)
+        if self.directory is None:
+            return
+        path = self.directory / f'{key}.pickle'
+        partial = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        partial.write_bytes(data)
+        os.replace(partial, path)
+        with self.__lock:
+            self.__disksize += len(data)
+            if self.__disksize > self.max_bytes:
+                self.__evict()
+
+    def __remember(self, key, data):
+        with self.__lock:
+            self.__memory[key] = data
+            self.__memory.move_to_end(key)
+            while len(self.__memory) > self.maxsize:
+                self.__memory.popitem(last=False)
+
+    def __evict(self):
+        """remove the least recently used files until the results fit in `max_bytes`"""
+        files = []
+        for p in self.directory.glob('*.pickle'):
+            try:
+                stat = p.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, p))
+        files.sort()
+        self.__disksize = sum(size for _, size, _ in files)
+        for _, size, p in files:
+            if self.__disksize <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            self.__disksize -= size
+
+    def clear(self):
+        """remove all of the stored results"""
+        with self.__lock:
+            self.__memory.clear()
+            if self.directory is not None:
+                for p in self.directory.glob('*.pickle'):
+                    p.unlink()
+            self.__disksize = 0
+
+    def __lookup(self, key, text):
+        data = self.get(key) if key is not None else None
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def findall(self, Type, text, budget=None):
+        """the results of :func:`textobjects.findall`, from the cache if
+        they are stored. Results which were cut short by the budget are not stored"""
+        key = self.key(Type, 'findall', text)
+        data = self.__lookup(key, text)
+        if data is not None:
+            return attach(pickle.loads(data), text)
+        found = Type.__findall__(text, **({} if budget is None else {'budget': budget}))
+        if key is not None:
+            self.put(key, pickle.dumps(found, pickle.HIGHEST_PROTOCOL))
+        return found
+
+    def match(self, Type, text, budget=None):
+        """the result of :func:`textobjects.match`, from the cache if it is stored
+
+        Raises:
+            (TemplateMatchError) if the text does not match, which is also stored
+        """
+        key = self.key(Type, 'match', text)
+        data = self.__lookup(key, text)
+        if data == _NOMATCH:
+            raise TemplateMatchError(None, f'{Type.__name__} does not match {text!r}')
+        if data is not None:
+            return attach(pickle.loads(data), text)
+        try:
+            obj = Type.__match__(text, **({} if budget is None else {'budget': budget}))
+        except TemplateMatchError:
+            if key is not None:
+                self.put(key, _NOMATCH)
+            raise
+        if key is not None:
+            self.put(key, pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+        return obj
@@ -0,0 +1,355 @@
+"""compile the node tree of a template into specialized python code
+
+Each node becomes a function ``_n<i>(text, pos, ctx)`` which returns
+``(end, value)`` or None when the node does not match. Regular expressions
+are matched in place with ``pattern.match(text, pos, ctx.stop)``, captures are kept
+in local variables and the wildcards become explicit loops. Each function
+spends a step of the context's budget, if there is one. Nodes which
+can not be lowered, like interpolation blocks, are called through their
+:func:`evaluate` method. The generated source is available as `__source__`
+on the class
+"""
+import builtins
+from typing import Mapping
+from textobjects import nodes, templates
+from textobjects import budget as budgets
+from textobjects.nodes import Context
+from textobjects.textobject import StructuredText, ListTextObject, TemplateMeta, register
+from textobjects.exceptions import TemplateMatchError, BudgetExceeded
+
+def _new(cls, text, start, end):
+    """create an instance of `cls` for the text between `start` and `end`"""
+    obj = object.__new__(cls)
+    attrs = obj.__dict__
+    attrs['data'] = text[start:end]
+    attrs['enclosing_text'] = text
+    attrs['start'] = start
+    attrs['end'] = end
+    return obj
+
+class Compiler:
+    """produces the source of the function for each node of the tree"""
+    def __init__(self):
+        self.lines = []
+        self.constants = {
+                '_new': _new,
+                'Mapping': Mapping,
+                'StructuredText': StructuredText,
+                'ListTextObject': ListTextObject,
+                'TemplateMatchError': TemplateMatchError,
+        }
+        self.count = 0
+
+    def constant(self, prefix, value):
+        """make `value` available to the generated code and return it's name"""
+        name = f'_{prefix}{len(self.constants)}'
+        self.constants[name] = value
+        return name
+
+    def compile(self, node, cls=None):
+        """add the function for `node` and it's children, returning the name
+        of the function
+
+        Args:
+            node (nodes.PatternNode): the node to compile
+            cls (type): the class of the value produced, the node's
+                :obj:`textobjectclass` if None is given
+        """
+        name = f'_n{self.count}'
+        self.count += 1
+        cls = self.constant('c', cls or node.textobjectclass)
+        if isinstance(node, (nodes.SubstitutionNode, nodes.TextObjectNode)):
+            body = self.fallback(node)
+        elif isinstance(node, nodes.RegexMatchNode):
+            body = self.regex(node, cls, 'match')
+        elif isinstance(node, nodes.RegexSearchNode):
+            body = self.regex(node, cls, 'search')
+        elif isinstance(node, nodes.OptionalNode):
+            body = self.optional(node, cls)
+        elif isinstance(node, nodes.RepeatNode):
+            body = self.repeat(node)
+        elif isinstance(node, nodes.SearchNode):
+            body = self.search(node, cls)
+        elif isinstance(node, nodes.EitherNode):
+            body = self.either(node)
+        elif type(node) is nodes.PatternNode:
+            body = self.pattern(node, cls)
+        else:
+            body = self.fallback(node)
+        self.lines.append(f'def {name}(text, pos, ctx):')
+        self.lines += ['    if ctx.budget is not None:', '        ctx.budget.spend(pos)']
+        self.lines.extend(f'    {line}' for line in body)
+        self.lines.append('')
+        return name
+
+    def children(self, node):
+        """compile the children of `node`
+
+        Returns:
+            (List[Tuple[nodes.PatternNode, str, str]]) each child with the name of it's function
+            and the name of it's class
+        """
+        return [(child, self.compile(child), self.constant('c', child.textobjectclass))
+                for child in node.children]
+
+    @staticmethod
+    def fallsback(node):
+        return isinstance(node, (nodes.SubstitutionNode, nodes.TextObjectNode)) or type(node) not in (
+                nodes.PatternNode, nodes.RegexMatchNode, nodes.RegexSearchNode, nodes.OptionalNode,
+                nodes.RepeatNode, nodes.SearchNode, nodes.EitherNode)
+
+    def fallback(self, node):
+        attempt = self.constant('attempt', nodes.attempt)
+        child = self.constant('node', node)
+        failure = self.constant('Failure', nodes.Failure)
+        return [
+            'ctx.index = pos',
+            f'outcome = {attempt}({child}, ctx)',
+            f'if outcome.__class__ is {failure}:',
+            '    return None',
+            'ctx, value = outcome',
+            'return ctx.index, value',
+        ]
+
+    def regex(self, node, cls, method):
+        pattern = self.constant('p', node.lookahead(node.expression))
+        return [
+            f'm = {pattern}.{method}(text, pos, ctx.stop)',
+            'if m is None:',
+            '    return None',
+            f'obj = _new({cls}, text, m.start(), m.end())',
+            'obj.matchobject = m',
+            'return m.end(), obj',
+        ]
+
+    def attributes(self, named, cls):
+        """create the object holding the named values"""
+        lines = [f'obj = _new({cls}, text, start, pos)', 'attrs = obj.__dict__']
+        lines += [f'attrs[{name!r}] = {var}' for name, var in named]
+        return lines
+
+    def pattern(self, node, cls):
+        lines = ['start = pos', 'matches = ctx.matches']
+        named, merged = [], False
+        for i, (child, func, childcls) in enumerate(self.children(node)):
+            var = f'v{i}'
+            lines += [
+                f'r = {func}(text, pos, ctx)',
+                'if r is None:',
+                '    return None',
+                f'pos, {var} = r',
+                'if matches is not None:',
+                f'    matches.append({var})',
+            ]
+            if child.name:
+                named.append((child.name, var))
+                lines.append(f'    ctx.matchdict[{child.name!r}] = {var}')
+                if self.fallsback(child):
+                    lines += [f'if isinstance({var}, StructuredText):',
+                              f'    {var}.__class__ = {childcls}']
+            elif self.fallsback(child):
+                merged = True
+                lines += [f'if isinstance({var}, Mapping):',
+                          f'    merged.update({var})']
+        if merged:
+            lines.insert(1, 'merged = {}')
+        lines += self.attributes(named, cls)
+        if merged:
+            lines.append('attrs.update(merged)')
+        return lines + ['return pos, obj']
+
+    def optional(self, node, cls):
+        lines = ['start = pos']
+        named = []
+        for i, (child, func, childcls) in enumerate(self.children(node)):
+            var = f'v{i}'
+            lines += [
+                f'r = {func}(text, pos, ctx)',
+                'if r is None:',
+                f'    {var} = None',
+                'else:',
+                f'    pos, {var} = r',
+                f'    if isinstance({var}, StructuredText):',
+                f'        {var}.__class__ = {childcls}',
+            ]
+            if child.name:
+                named.append((child.name, var))
+        if len(named) == 1:
+            return lines + [f'return pos, {named[0][1]}']
+        return lines + self.attributes(named, cls) + ['return pos, obj']
+
+    def repeat(self, node):
+        lines = ['items = ListTextObject([], text, pos, pos)']
+        for child, func, childcls in self.children(node):
+            lines += [
+                'found = False',
+                'while pos < ctx.stop:',
+                f'    r = {func}(text, pos, ctx)',
+                '    if r is None:',
+                '        break',
+                '    end, value = r',
+            ]
+            if self.fallsback(child):
+                lines += [
+                '    if isinstance(value, Mapping):',
+                '        items.extend(value.values())',
+                '    else:',
+                '        items.append(value)',
+                ]
+            else:
+                lines.append('    items.append(value)')
+            lines += [
+                '    found = True',
+                '    if end == pos:',
+                '        break',
+                '    pos = end',
+                'if not found:',
+                '    return None',
+            ]
+        return lines + ['items.end = pos', 'return pos, items']
+
+    def search(self, node, cls):
+        lines = ['start = pos', 'merged = {}', 'while pos < ctx.stop:', '    p = pos']
+        named, indent = [], '    '
+        for i, (child, func, childcls) in enumerate(self.children(node)):
+            var = f'v{i}'
+            lines += [
+                f'{indent}r = {func}(text, p, ctx)',
+                f'{indent}if r is not None:',
+                f'{indent}    p, {var} = r',
+            ]
+            indent += '    '
+            if child.name:
+                named.append((child.name, var))
+            elif self.fallsback(child):
+                lines += [f'{indent}if isinstance({var}, Mapping):',
+                          f'{indent}    merged.update({var})']
+        lines += [f'{indent}pos = p', f'{indent}break', '    pos += 1', 'else:', '    return None']
+        if len(named) == 1:
+            return lines + [f'return pos, {named[0][1]}']
+        return lines + self.attributes(named, cls) + ['attrs.update(merged)', 'return pos, obj']
+
+    def either(self, node):
+        lines = []
+        for child, func, childcls in self.children(node):
+            lines += [
+                f'r = {func}(text, pos, ctx)',
+                'if r is not None:',
+                '    return r',
+            ]
+        return lines + ['return None']
+
+def generate(rt, cls=None):
+    """compile the tree rooted at `rt` into a python function
+
+    Args:
+        rt (nodes.PatternNode): the root of the tree
+        cls (type): the class of the object produced by the root node
+
+    Returns:
+        (Tuple[Callable, str]) the function ``match(text, pos, ctx)``, which returns
+        ``(end, result)`` or None if the text does not match, and it's source
+    """
+    compiler = Compiler()
+    entry = compiler.compile(rt, cls)
+    source = '\n'.join(compiler.lines)
+    namespace = dict(compiler.constants)
+    code = builtins.compile(source, f'<textobjects.codegen {rt.name}>', 'exec')
+    exec(code, namespace)
+    return namespace[entry], source
+
+def _locate(text, enclosing):
+    """the text to match against, and where the `text` is within it"""
+    if enclosing is None or enclosing is text:
+        return text, 0
+    pos = enclosing.rfind(text)
+    return (enclosing, pos) if pos >= 0 else (text, 0)
+
+def maketextobject(name, rt):
+    """create a StructuredText subclass which matches using the code generated
+    from the tree rooted at `rt`"""
+    def newcontext(cls, fulltext, text, pos, scope, budget, endpos=None):
+        ctx = Context(fulltext, text, pos, scope=scope, budget=budget, endpos=endpos)
+        if not (cls.keepmatches or interpolating):
+            ctx.matches = ctx.matchdict = None
+        return ctx
+
+    def finish(cls, ctx, result):
+        if cls.keepmatches:
+            result.matches = ctx.matches
+            result.matchdict = ctx.matchdict
+        return result
+
+    class Temp(StructuredText, metaclass=TemplateMeta):
+        def __new__(cls, text):
+            return cls.__match__(text)
+
+        def __init__(self, text):
+            pass
+
+        @classmethod
+        def __match__(cls, text, enclosing=None, scope=None, budget=None):
+            enclosing, pos = _locate(text, enclosing)
+            ctx = newcontext(cls, enclosing, text, pos, scope, budgets.start(budget))
+            found = match(enclosing, pos, ctx)
+            if found is None:
+                raise TemplateMatchError(ctx)
+            return finish(cls, ctx, found[1])
+
+        @classmethod
+        def __search__(cls, text, enclosing=None, scope=None, budget=None):
+            for result in cls.__finditer__(text, enclosing, scope, budget):
+                return result
+            raise TemplateMatchError(None)
+
+        @classmethod
+        def __matchat__(cls, text, pos=0, endpos=None, scope=None, budget=None):
+            endpos = len(text) if endpos is None else endpos
+            ctx = newcontext(cls, text, text[pos:endpos], pos, scope, budgets.start(budget), endpos)
+            found = match(text, pos, ctx)
+            if found is None:
+                raise TemplateMatchError(ctx)
+            return finish(cls, ctx, found[1])
+
+        @classmethod
+        def __searchat__(cls, text, pos=0, endpos=None, scope=None, budget=None):
+            endpos = len(text) if endpos is None else endpos
+            budget = budgets.start(budget)
+            for prospect in first.finditer(text, pos, endpos):
+                ctx = newcontext(cls, text, text[pos:endpos], prospect.start(), scope, budget, endpos)
+                found = match(text, ctx.index, ctx)
+                if found is not None:
+                    return finish(cls, ctx, found[1])
+            raise TemplateMatchError(None)
+
+        @classmethod
+        def __finditer__(cls, text, enclosing=None, scope=None, budget=None):
+            enclosing, base = _locate(text, enclosing)
+            budget = budgets.start(budget)
+            for prospect in first.finditer(text):
+                ctx = newcontext(cls, enclosing, text, base + prospect.start(), scope, budget)
+                found = match(enclosing, ctx.index, ctx)
+                if found is None:
+                    continue
+                yield finish(cls, ctx, found[1])
+
+        @classmethod
+        def __findall__(cls, text, enclosing=None, scope=None, budget=None):
+            results = []
+            try:
+                results.extend(cls.__finditer__(text, enclosing, scope, budget))
+            except BudgetExceeded as e:
+                e.partial = results
+                raise
+            return results
+
+    Temp.__name__ = Temp.__qualname__ = name or 'SomeTextObject'
+    match, Temp.__source__ = generate(rt, Temp)
+    first = rt.firstexpression
+    interpolating = nodes.interpolates(rt)
+    return Temp
+
+def parse(name, template):
+    """create a textobject class from the template using generated code"""
+    rt = templates.parse(template, name, returntree=True)
+    return register(maketextobject(name, rt), template, 'codegen', subclasses=nodes.templateclasses(rt))
@@ -1,57 +1,85 @@
-import time
 import collections as _collections
 import textobjects
+from textobjects import compressed
+from bisect import bisect_right
 from itertools import chain, islice
 from pathlib import Path
 
 class ChainSequence(_collections.abc.MutableSequence):
-    """Treat a group of MutableSequence as a single Sequence"""
+    """Treat a group of MutableSequence as a single Sequence
+
+    The offset of each sequence is kept in a prefix array, so an index is
+    translated with a binary search. Changes made through the ChainSequence 
+    keep the offsets up to date, call :func:`invalidate` when one of the 
+    sequences is changed directly
+    """
 
     def __init__(self, *sequences):
         self.sequences = sequences
+        self._positions = {id(seq): i for i, seq in enumerate(sequences)}
+        self._offsets = [0] * (len(sequences) + 1)
+        self._stale = 0
+
+    def invalidate(self, sequence=None):
+        """recompute the offsets from the given sequence onward, or all 
+        of the offsets if no sequence is given"""
+        i = self._positions.get(id(sequence), 0) if sequence is not None else 0
+        self._stale = min(self._stale, i)
+
+    def __offsets(self):
+        offsets = self._offsets
+        for i in range(self._stale, len(self.sequences)):
+            offsets[i+1] = offsets[i] + len(self.sequences[i])
+        self._stale = len(self.sequences)
+        return offsets
 
     def __convert_key(self, key):
+        offsets = self.__offsets()
         if key < 0:
-            raise NotImplementedError('negitive indexing not supported')
-        end = 0
-        for seq in self.sequences:
-            end += len(seq)
-            
-            if key < end:
-                return key-end, seq
-        raise KeyError(key)
+            key += offsets[-1]
+        if not 0 <= key < offsets[-1]:
+            raise IndexError(key)
+        i = bisect_right(offsets, key) - 1
+        return key - offsets[i], i
 
     def __getitem__(self, key):
         if isinstance(key, slice):
-            return islice(self, key.start, key.stop, key.step)
-        conkey, seq = self.__convert_key(key)
-        return seq[conkey]
+            return [self[i] for i in range(*key.indices(len(self)))]
+        conkey, i = self.__convert_key(key)
+        return self.sequences[i][conkey]
 
     def __setitem__(self, key, value):
-        conkey, seq = self.__convert_key(key)
-        seq[conkey] = value
+        conkey, i = self.__convert_key(key)
+        self.sequences[i][conkey] = value
+        self._stale = min(self._stale, i)
 
     def __delitem__(self, key):
-        conkey, seq = self.__convert_key(key)
-        del seq[conkey]
+        conkey, i = self.__convert_key(key)
+        del self.sequences[i][conkey]
+        self._stale = min(self._stale, i)
 
     def insert(self, index, value):
         if index < len(self):
-            conkey, seq = self.__convert_key(index)
-            seq.insert(conkey, value)
+            conkey, i = self.__convert_key(index)
+            self.sequences[i].insert(conkey, value)
         else:
-            self.sequences[-1].append(value)
+            i = len(self.sequences) - 1
+            self.sequences[i].append(value)
+        self._stale = min(self._stale, i)
 
     def __len__(self):
-        return sum([len(s) for s in self.sequences])
+        return self.__offsets()[-1]
 
     def __iter__(self):
         return chain(*self.sequences)
 
     def sort(self, *args, **kwargs):
         _sorted = sorted(self, *args, **kwargs)
-        for i, _ in enumerate(self):
-            self[i] = _sorted[i]
+        offsets = self.__offsets()
+        for i, seq in enumerate(self.sequences):
+            for j in range(offsets[i+1] - offsets[i]):
+                seq[j] = _sorted[offsets[i] + j]
+        self.invalidate()
 
 class PageView(_collections.abc.Sequence):
     def __init__(self, text, *types, find=textobjects.findall):
@@ -59,6 +87,7 @@ class PageView(_collections.abc.Sequence):
         self.types = types
         self.find = find
         self._objects = self._search_text()
+        self._found = [(obj.start, obj.end, str(obj)) for obj in self._objects]
 
     def __str__(self):
         return self.data
@@ -80,14 +109,23 @@ class PageView(_collections.abc.Sequence):
 
 class Page(PageView, _collections.abc.MutableSequence):
     """A block of text which contains other TextObjects"""
+    document = None
+    """the :class:`Document` the page is in, which is told when it's length changes"""
+
     def __setitem__(self, key, value):
         self._objects[key] = value
+        self.__changed()
 
     def __delitem__(self, key):
         self[key] = None
 
     def insert(self, key, value):
         self._objects.insert(key, value)
+        self.__changed()
+
+    def __changed(self):
+        if self.document is not None:
+            self.document.invalidate(self)
 
     def pop(self, index=None):
         """Since the length of this collection should not decrease pop needs
@@ -99,21 +137,54 @@ class Page(PageView, _collections.abc.MutableSequence):
 
     def write(self):
         """apply the changes in this collection to the text, subsituting each of the values
-        with it's associated new value"""
-        objects = self._search_text()
-        offset = 0
-        while len(objects) > len(self): # items were removed
+        with it's associated new value. The new text is assembled from the unchanged 
+        segments and the new values and joined once, values which did not change are skipped.
+        Added values are put on their own line after the text, and a removed value which
+        is not followed by any other object takes the line break before it with it
+
+        Returns:
+            (bool) True if the text was changed
+        """
+        while len(self._found) > len(self): # items were removed
             self.insert(0, None) 
-        for old, new in zip(objects, self):
-            if not new:
-                new = ''
-            self.data = self.data[:old.start+offset] \
-                + str(new) + self.data[old.end+offset:]
+        segments, found = [], []
+        pos = offset = 0
+        last = max((i for i, new in enumerate(self[:len(self._found)]) if new), default=-1)
+        for i, ((start, end, old), new) in enumerate(zip(self._found, self)):
+            new = str(new) if new else ''
+            if new != old:
+                gap = self.data[pos:start]
+                if not new and i > last and gap.endswith('\n'):
+                    gap = gap[:-1] # the line break before a removed trailing object
+                segments.append(gap)
+                segments.append(new)
+                pos = end
+            if new:
+                found.append((start+offset, start+offset+len(new), new))
             offset += len(new) - len(old)
-        j = len(objects)
-        while j < len(self): # items were added
-            self.text = self.text.strip() + '\n' + str(self[j])
-            j += 1
+        added = [str(it) for it in self[len(self._found):] if it]
+        if not segments and not added:
+            return False
+        segments.append(self.data[pos:])
+        if added: # items were added, each on a new line after the text
+            while segments and not segments[-1].rstrip('\n'):
+                segments.pop()
+            if segments:
+                segments[-1] = segments[-1].rstrip('\n')
+            length = sum(map(len, segments))
+            for new in added:
+                if length: # a line break between objects, not before the first
+                    segments.append('\n')
+                    length += 1
+                found.append((length, length+len(new), new))
+                segments.append(new)
+                length += len(new)
+        data = ''.join(segments)
+        self.data = data
+        self._found = found
+        self._objects = [it for it in self._objects if it]
+        self.__changed()
+        return True
 
 class PageMap(_collections.abc.MutableMapping):
     """A map interface for a Page
@@ -151,28 +222,40 @@ class PageMap(_collections.abc.MutableMapping):
         del self._map[key]
 
 class File:
-    """Context manager to create a Page from a file"""
+    """Context manager to create a Page from a file, a compressed file
+    can be read but the changes to it's page can not be written"""
     def __init__(self, path, *types, find=textobjects.findall):
         self.path = Path(path).expanduser().absolute()
-        self.file = None
         self.find = find
         self.types = types
     
     def __enter__(self):
-        self.page = Page(self.path.read_text(), *self.types, find=self.find)
-        self.file = self.path.open('w')
+        self.page = Page(compressed.read_text(self.path), *self.types, find=self.find)
         return self.page
 
     def __exit__(self, type, value, traceback):
-        self.page.write()
-        self.file.write(self.page.data)
-        print(self.page.data)
-        self.file.close()
+        if self.page.write():
+            compressed.writable(self.path).write_text(self.page.data)
+
+    async def __aenter__(self):
+        from textobjects import aio
+        text = await aio.run(compressed.read_text, self.path)
+        self.page = Page(text, *self.types, find=self.find)
+        return self.page
+
+    async def __aexit__(self, type, value, traceback):
+        from textobjects import aio
+        if self.page.write():
+            await aio.run(compressed.writable(self.path).write_text, self.page.data)
 
 class Document(ChainSequence):
+    """The objects of several :class:`Page`, a page which is changed directly
+    invalidates it's offset in the document"""
     def __init__(self, *pages):
         self.pages = list(pages)
         super(Document, self).__init__(*pages)
+        for page in self.pages:
+            page.document = self
 
     def __contains__(self, value):
         """support checking for pages and individual objects"""
@@ -180,29 +263,51 @@ class Document(ChainSequence):
                 or value in self.pages)
 
     def write(self):
-        for page in self.pages:
-            page.write()
+        """write the changes to each page
+
+        Returns:
+            (List[bool]) whether each page was changed
+        """
+        return [page.write() for page in self.pages]
 
 class Archive:
-    """A context manager to create a Document from a group of files"""
+    """A context manager to create a Document from a group of files, which
+    are read and decompressed in parallel"""
     def __init__(self, paths, *types, find=textobjects.findall):
         self.paths = paths
         self.types = types
         self.find = find
 
     def __enter__(self):
-        contents = [p.read_text() for p in self.paths]
+        from textobjects import aio
+        contents = list(aio.io_map(compressed.read_text, self.paths))
         pages = [Page(content, *self.types, find=self.find) 
                  for content in contents]
         self.document = Document(*pages)
         return self.document
 
     def __exit__(self, type, value, traceback):
-        self.document.write()
-        for page, p in zip(self.document.pages, self.paths):
-            f = p.open('w') 
-            f.write(page.data)
-            f.close()
+        changed = self.document.write()
+        for page, p, write in zip(self.document.pages, self.paths, changed):
+            if write:
+                compressed.writable(p).write_text(page.data)
+
+    async def __aenter__(self):
+        import asyncio
+        from textobjects import aio
+        contents = await asyncio.gather(*[aio.run(compressed.read_text, p) for p in self.paths])
+        pages = [Page(content, *self.types, find=self.find) 
+                 for content in contents]
+        self.document = Document(*pages)
+        return self.document
+
+    async def __aexit__(self, type, value, traceback):
+        import asyncio
+        from textobjects import aio
+        changed = self.document.write()
+        await asyncio.gather(*[aio.run(compressed.writable(p).write_text, page.data)
+                               for page, p, write in zip(self.document.pages, self.paths, changed)
+                               if write])
 
 def open(filename, *types, find=textobjects.findall):
     return File(Path(filename), *types, find=find) 
@@ -212,3 +317,12 @@ def glob(rt_dir, glob, *types, find=textobjects.findall):
     files = [p for p in files if not p.is_dir()]
     return Archive(files, *types,  find=find)
 
+def aopen(filename, *types, find=textobjects.findall):
+    """like :func:`open`, for use with ``async with``"""
+    return File(Path(filename), *types, find=find) 
+
+def aglob(rt_dir, glob, *types, find=textobjects.findall):
+    """like :func:`glob`, for use with ``async with``"""
+    files = Path(rt_dir).expanduser().glob(glob)
+    files = [p for p in files if not p.is_dir()]
+    return Archive(files, *types,  find=find)
@@ -0,0 +1,158 @@
+"""reading compressed files
+
+gzip, bz2 and xz files are recognised by their extension, or else by the
+magic bytes at the start of the file, and are decompressed as they are read.
+zstd files are supported when the `zstandard` package is installed, or the
+standard library has :mod:`compression.zstd`. The pages, documents and storages
+read compressed files transparently, but they can not write them back::
+
+    for todo in compressed.iterfind(Todo, 'notes.md.gz'):
+        print(todo.item)
+
+:func:`iterfind` streams the decompressed text into the matching engine in
+blocks of whole lines, so a file is never decompressed in memory all at once.
+The spans of each object are within the block it was found in, which is it's
+`enclosing_text`, and a match can not span two blocks
+"""
+import io
+from pathlib import Path
+from textobjects import lib
+from textobjects import budget as budgets
+
+BLOCK_SIZE = 1 << 20
+"""The number of characters which are matched at a time by :func:`iterfind`,
+each block is extended to the end of it's last line"""
+
+EXTENSIONS = {'.gz': 'gzip', '.gzip': 'gzip', '.bz2': 'bz2', '.xz': 'xz',
+              '.lzma': 'xz', '.zst': 'zstd', '.zstd': 'zstd'}
+"""The compression of a file, by it's extension"""
+
+HEADER_SIZE = 10
+"""The number of bytes read to recognise a file which does not have one of the :obj:`EXTENSIONS`"""
+
+def _bz2(head):
+    # 'BZh' and the block size, then the magic of the first block or of the end of the stream
+    return head[:3] == b'BZh' and head[4:10] in (b'1AY&SY', b'\x17rE8P\x90')
+
+MAGIC = {
+    'gzip': lambda head: head[:2] == b'\x1f\x8b',
+    'bz2': _bz2,
+    'xz': lambda head: head[:6] == b'\xfd7zXZ\x00',
+    'zstd': lambda head: head[:4] == b'\x28\xb5\x2f\xfd',
+}
+"""Recognise the compression of a file from it's first :obj:`HEADER_SIZE` bytes"""
+
+def codec(path):
+    """the compression of the file, **'gzip'**, **'bz2'**, **'xz'** or **'zstd'**,
+    or None if it is not compressed or does not exist"""
+    path = Path(path)
+    name = EXTENSIONS.get(path.suffix.lower())
+    if name is not None:
+        return name
+    try:
+        with path.open('rb') as f:
+            head = f.read(HEADER_SIZE)
+    except OSError:
+        return None
+    for name, recognise in MAGIC.items():
+        if recognise(head):
+            return name
+    return None
+
+def compressed(path):
+    """True if the file is compressed"""
+    return codec(path) is not None
+
+def _zstd(path):
+    try:
+        from compression import zstd
+        return zstd.open(path, 'rb')
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise ModuleNotFoundError(f'reading {path} requires the zstandard package') from None
+    return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+
+def open_binary(path, name=None):
+    """a binary stream of the decompressed contents of the file"""
+    name = name or codec(path)
+    if name == 'gzip':
+        import gzip
+        return gzip.open(path, 'rb')
+    if name == 'bz2':
+        import bz2
+        return bz2.open(path, 'rb')
+    if name == 'xz':
+        import lzma
+        return lzma.open(path, 'rb')
+    if name == 'zstd':
+        return _zstd(path)
+    return open(path, 'rb')
+
+def open_text(path, encoding=None, errors=None):
+    """a text stream of the file, which is decompressed as it is read"""
+    name = codec(path)
+    if name is None:
+        return open(path, encoding=encoding, errors=errors)
+    return io.TextIOWrapper(open_binary(path, name), encoding=encoding, errors=errors)
+
+def read_text(path, encoding=None, errors=None):
+    """the text of the file like :func:`Path.read_text`, decompressed if it is compressed"""
+    with open_text(path, encoding, errors) as f:
+        return f.read()
+
+def writable(path):
+    """the path, if it can be written
+
+    Raises:
+        (io.UnsupportedOperation) if the file is compressed
+    """
+    if compressed(path):
+        raise io.UnsupportedOperation(f'{path} is compressed, compressed files can only be read')
+    return Path(path)
+
+def blocks(path, size=BLOCK_SIZE, encoding=None):
+    """the text of the file in blocks of whole lines of at least `size` characters"""
+    with open_text(path, encoding) as stream:
+        while True:
+            block = stream.read(size)
+            if not block:
+                return
+            if not block.endswith('\n'):
+                block += stream.readline()
+            yield block
+
+def iterfind(Type, path, budget=None, blocksize=BLOCK_SIZE, encoding=None):
+    """lazily produce each occurrence of `Type` in the file, decompressing
+    and matching it a block at a time
+
+    Args:
+        Type (StructuredText): the textobject class to look for
+        path (str): the file, which may be compressed
+        budget (Budget): limits the work done for the whole file
+        blocksize (int): see :obj:`BLOCK_SIZE`
+    """
+    budget = budgets.start(budget)
+    for block in blocks(path, blocksize, encoding):
+        yield from lib.finditer(Type, block, budget)
+
+def findall(Type, paths, budget=None, executor=None, blocksize=BLOCK_SIZE, encoding=None):
+    """the occurrences of `Type` in each of the files, which are
+    decompressed and matched in parallel
+
+    Args:
+        executor (concurrent.futures.Executor): where to scan the files,
+            a new thread pool if None is given
+
+    Returns:
+        (Dict[Path, List[StructuredText]]) the objects found in each file
+    """
+    paths = [Path(p) for p in paths]
+    scan = lambda path: list(iterfind(Type, path, budget, blocksize, encoding))
+    if executor is not None:
+        return dict(zip(paths, executor.map(scan, paths)))
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor() as executor:
+        return dict(zip(paths, executor.map(scan, paths)))
@@ -7,26 +7,68 @@ import concurrent.futures as futures
 from pathlib import Path
 from itertools import chain, islice
 from functools import reduce
-from textobjects import findall, match, matchlines, StructuredText
+from textobjects import findall, match, matchlines, render, StructuredText, aio, compressed
 from textobjects.textobject import textobjecttypes
+from textobjects.collections import ChainSequence
+from textobjects.piecetable import PieceTable
 
 class Page(StructuredText, collections.abc.MutableSequence):
-    """A block of text which contains other TextObjects"""
+    """A block of text which contains other TextObjects
+
+    The text is held in a :class:`PieceTable`, so changing an entry only 
+    touches the text around it. The spans of the entries which follow an edit
+    are shifted rather than found again, call :func:`update` to rescan the text.
+    `find` is called with each type and the text, :func:`cache.ResultCache.findall`
+    reuses the results of text which has not changed
+    """
     def __init__(self, text='', *types, find=findall):
         super(Page, self).__init__(text, text, 0, len(text))
         self.types = types if types else textobjecttypes()
         self.__find = find
         self.__update()
 
+    @property
+    def data(self):
+        return self._buffer.text()
+
+    @data.setter
+    def data(self, text):
+        self._buffer = PieceTable(text)
+
     def __len__(self):
         return len(self._objects)
 
     def __update(self):
+        self.__unindex(*getattr(self, '_objects', ()))
         self._objects = []
         for typ in self.types:
             found = self.__find(typ, self.data)
             self._objects.extend(found)
         self._objects.sort(key=lambda obj: obj.start)
+        self.__index(*self._objects)
+        self.__changed()
+
+    @property
+    def source(self):
+        """where the objects of the page are, it's path or it's number"""
+        return getattr(self, 'path', None) or getattr(self, 'number', None)
+
+    def __index(self, *objects):
+        index = getattr(getattr(self, 'document', None), 'invertedindex', None)
+        if index is not None:
+            for obj in objects:
+                index.add(obj, self.source)
+
+    def __unindex(self, *objects):
+        index = getattr(getattr(self, 'document', None), 'invertedindex', None)
+        if index is not None:
+            for obj in objects:
+                index.remove(obj)
+
+    def __changed(self):
+        self.end = len(self._buffer)
+        if getattr(self, 'document', None) is not None:
+            self.document.invalidate(self)
 
     def __shift_spans(self, diff, startind):
         for it in self[startind:]:
@@ -41,35 +83,56 @@ class Page(StructuredText, collections.abc.MutableSequence):
 
     def __delitem__(self, key):
         obj = self[key]
-        self.data = self.data[:obj.start].rstrip() + self.data[obj.end:]
-        l = len(obj)
-        self.__update()
-        # del self._objects[key]
-        # self.__shift_spans(0-l, key)
+        start = obj.start
+        while start: # strip the whitespace before the entry
+            window = self._buffer[max(0, start-80):start]
+            stripped = window.rstrip()
+            start -= len(window) - len(stripped)
+            if stripped:
+                break
+        self._buffer.delete(start, obj.end)
+        del self._objects[key]
+        self.__unindex(obj)
+        self.__shift_spans(start - obj.end, key)
+        self.__changed()
 
     def __insert(self, start, end, repl):
-        repl = self.__convert_to_textobject_from_str(repl)
-        self.data = (self.data[:start]
-                    + f'{repl.strip()}\n'
-                    + self.data[end:]).lstrip()
+        """put `repl` in place of the text between `start` and `end`, 
+        returning the textobject with it's span set. A textobject which is
+        given is copied, so the spans of the caller's object are not changed"""
+        if isinstance(repl, StructuredText):
+            copied = object.__new__(type(repl))
+            copied.__dict__.update(repl.__dict__)
+            repl = copied
+        else:
+            repl = self.__convert_to_textobject_from_str(repl)
+        text = str(repl).strip()
+        self._buffer.replace(start, end, text)
+        repl.start, repl.end = start, start + len(text)
+        return repl
 
     def __setitem__(self, key, value):
         obj = self[key]
-        self.__insert(obj.start, obj.end, value)
+        value = self.__insert(obj.start, obj.end, value)
         self._objects[key] = value
-        self.__update()
-        # self.__shift_spans(len(value) - len(obj), key+1)
+        self.__unindex(obj)
+        self.__index(value)
+        self.__shift_spans((value.end - value.start) - (obj.end - obj.start), key+1)
+        self.__changed()
 
     def __bool__(self):
         return len(self) > 0
 
     def __convert_to_textobject_from_str(self, txtobj):
+        """a mapping of attribute values is rendered, which does not need to 
+        match the text again, other values are matched as text"""
         _txtobj = txtobj
         if not isinstance(txtobj, StructuredText):
             _txtobj = None
+            convert = render if isinstance(txtobj, collections.abc.Mapping) else match
             for typ in self.types:
                 try:
-                    _txtobj = match(typ, txtobj)
+                    _txtobj = convert(typ, txtobj)
                 except: ...
             if not _txtobj:
                 raise ValueError
@@ -77,12 +140,22 @@ class Page(StructuredText, collections.abc.MutableSequence):
         return _txtobj
 
     def insert(self, index, value):
-        value = self.__convert_to_textobject_from_str(value)
-        ind = self[index].end if index < len(self) else len(self.data)
-        self.__insert(ind, ind, value)
-        self.__update()
-        # self._objects.insert(ind, value)
-        # self.__shift_spans(len(value), index+1)
+        if index < len(self):
+            ind = self[index].end
+            self._buffer.insert(ind, '\n')
+            value = self.__insert(ind+1, ind+1, value)
+            self._objects.insert(index+1, value)
+            self.__shift_spans(value.end - ind, index+2)
+        else:
+            ind = len(self._buffer)
+            if ind and self._buffer[ind-1] != '\n':
+                self._buffer.insert(ind, '\n')
+                ind += 1
+            value = self.__insert(ind, ind, value)
+            self._buffer.insert(value.end, '\n')
+            self._objects.append(value)
+        self.__index(value)
+        self.__changed()
 
     # def sort(self, *args, **kwargs):
         # _sorted = sorted(self, *args, **kwargs)
@@ -91,11 +164,23 @@ class Page(StructuredText, collections.abc.MutableSequence):
 
 
 class Document(ChainSequence):
-    """A set of TextObjects across multiple :class:`Page`"""
-    def __init__(self, *pages):
+    """A set of TextObjects across multiple :class:`Page`
+
+    Args:
+        index (bool): keep an :class:`index.InvertedIndex` of the objects as `invertedindex`
+    """
+    def __init__(self, *pages, index=False):
         self.pages = pages
+        self.invertedindex = None
         for i, pg in enumerate(self.pages):
             pg.number = i + 1
+            pg.document = self
+        if index:
+            from textobjects.index import InvertedIndex
+            self.invertedindex = InvertedIndex([pg.source for pg in self.pages])
+            for pg in self.pages:
+                for obj in pg:
+                    self.invertedindex.add(obj, pg.source)
         super(Document, self).__init__(*self.pages)
 
     @property
@@ -111,9 +196,11 @@ class Document(ChainSequence):
             page.sort()
 
 class PageFile(Page):
-    """a file containing some set of TextObjects"""
+    """a file containing some set of TextObjects. A compressed file is
+    decompressed when it is opened, and can only be closed unchanged"""
     def __init__(self, types, path, find=findall):
         self.path = Path(path).expanduser()
+        self.__read = None
         super(PageFile, self).__init__('', *types, find=find)
 
     def __enter__(self):
@@ -123,17 +210,35 @@ class PageFile(Page):
         self.close()
 
     def close(self):
-        self.path.write_text(str(self))
+        text = str(self)
+        if text != self.__read or not compressed.compressed(self.path):
+            compressed.writable(self.path).write_text(text)
 
     def open(self):
-        self.data += self.path.read_text()
+        self.data += compressed.read_text(self.path)
+        self.__read = str(self)
         self.update()
         return self
 
+    async def __aenter__(self):
+        return await self.aopen()
+
+    async def __aexit__(self, type, value, traceback):
+        await self.aclose()
+
+    async def aclose(self):
+        await aio.run(self.close)
+
+    async def aopen(self):
+        self.data += await aio.run(compressed.read_text, self.path)
+        self.__read = str(self)
+        await aio.run(self.update)
+        return self
+
 class DocumentFile(Document):
-    def __init__(self, types, paths, find=findall):
+    def __init__(self, types, paths, find=findall, index=False):
         pages = [PageFile(types, path, find) for path in paths]
-        super(DocumentFile, self).__init__(*pages)
+        super(DocumentFile, self).__init__(*pages, index=index)
 
     def __enter__(self):
         with futures.ThreadPoolExecutor() as executor:
@@ -149,10 +254,46 @@ class DocumentFile(Document):
         # for pg in self.pages:
             # pg.close()
 
+    async def __aenter__(self):
+        await asyncio.gather(*[pg.aopen() for pg in self.pages])
+        return self
+
+    async def __aexit__(self, type, value, traceback):
+        await self.aclose()
+
+    async def aclose(self):
+        await asyncio.gather(*[pg.aclose() for pg in self.pages])
+
+    async def apages(self):
+        """open each page concurrently, yielding the pages in the order 
+        that they finish loading"""
+        for opened in asyncio.as_completed([pg.aopen() for pg in self.pages]):
+            yield await opened
+
 def page(filename, *types, find=findall):
     return PageFile(types, filename, find=find)
 
-def glob(rt_dir, glob, *types, find=findall):
+def glob(rt_dir, glob, *types, find=findall, index=False):
+    """a :class:`DocumentFile` of the files matching the glob, with an 
+    inverted index of it's objects if `index` is True"""
+    files = Path(rt_dir).expanduser().glob(glob)
+    files = [p for p in files if not p.is_dir()]
+    return DocumentFile(types, files, find=find, index=index)
+
+def aopen(filename, *types, find=findall):
+    """like :func:`page`, but the file is read and written without blocking
+    the event loop::
+
+        async with aopen('todo.txt', Todo) as pg: ...
+    """
+    return PageFile(types, filename, find=find)
+
+def aglob(rt_dir, glob, *types, find=findall, index=False):
+    """like :func:`glob`, but the files are read and written concurrently 
+    without blocking the event loop::
+
+        async with aglob('~/notes', '*.md', Todo) as doc: ...
+    """
     files = Path(rt_dir).expanduser().glob(glob)
     files = [p for p in files if not p.is_dir()]
-    return DocumentFile(types, files, find=find)
+    return DocumentFile(types, files, find=find, index=index)
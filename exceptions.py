@@ -2,3 +2,23 @@ class TemplateMatchError(ValueError):
     def __init__(self, context, *args, **kwargs):
         super(TemplateMatchError, self).__init__(*args, **kwargs)
         self.context = context
+
+class BudgetExceeded(Exception):
+    """raised when a match runs out of it's :class:`budget.Budget`. It is not
+    a :class:`TemplateMatchError`, so it is never mistaken for a failed match
+
+    Args:
+        reason (str): **'steps'** or **'timeout'**
+        steps (int): the number of evaluation steps taken
+        elapsed (float): the seconds since the budget was started
+        index (int): the furthest position in the text which was reached
+        partial (List): the results which were found before the budget ran out
+    """
+    def __init__(self, reason, steps, elapsed, index=0, partial=None):
+        super(BudgetExceeded, self).__init__(
+                f'{reason} budget exceeded after {steps} steps and {elapsed:.3f}s at index {index}')
+        self.reason = reason
+        self.steps = steps
+        self.elapsed = elapsed
+        self.index = index
+        self.partial = partial if partial is not None else []
@@ -0,0 +1,126 @@
+"""an inverted index of the words in the textobjects of a document or storage
+
+The index maps each word to the objects which contain it, so a query only
+looks at the objects which have all of the words instead of matching every
+page again::
+
+    with documents.glob('~/notes', '*.md', Todo, index=True) as doc:
+        for hit in doc.invertedindex.query('deploy', types=Todo):
+            print(hit.source, hit.span, hit.obj)
+
+A :class:`documents.Document` keeps it's index up to date as it's pages are
+edited or updated, and a :class:`storage.TextObjectStorage` as it's files change.
+An index can also be maintained by hand with :func:`InvertedIndex.add` and
+:func:`InvertedIndex.remove`
+"""
+import re
+from dataclasses import dataclass
+from typing import Any
+from textobjects.storage import TextObjectObserver
+
+TOKEN = re.compile(r'\w+')
+"""The words which are indexed"""
+
+def tokens(text):
+    """the distinct words of the text, in lower case"""
+    return frozenset(TOKEN.findall(str(text).lower()))
+
+@dataclass
+class Hit:
+    """An object found by a query"""
+    obj: Any
+    """the textobject"""
+    source: Any
+    """where the object is, the path of it's file or the number of it's page"""
+    typ: type
+    """the textobject class the object was found as"""
+
+    @property
+    def span(self):
+        return self.obj.span
+
+class InvertedIndex(TextObjectObserver):
+    """A mapping of words to the objects which contain them. The objects are
+    held by identity, so an object whose span is changed in place stays indexed
+
+    Args:
+        sources (Iterable): the files or pages in the order their hits are
+            given in, other sources follow in the order they are first added
+    """
+    def __init__(self, sources=()):
+        self.postings = {}
+        """the ids of the objects which contain each word"""
+        self.entries = {}
+        """the :class:`Hit` and words of each object, by id"""
+        self.__sources = {}
+        for source in sources:
+            self.__sources.setdefault(source, len(self.__sources))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, obj):
+        return id(obj) in self.entries
+
+    def add(self, obj, source=None, typ=None):
+        """index the object, an object which is already indexed is indexed again"""
+        if id(obj) in self.entries:
+            self.remove(obj)
+        words = tokens(obj)
+        self.__sources.setdefault(source, len(self.__sources))
+        self.entries[id(obj)] = (Hit(obj, source, typ or type(obj)), words)
+        for word in words:
+            self.postings.setdefault(word, set()).add(id(obj))
+
+    def remove(self, obj):
+        """stop indexing the object, if it is indexed"""
+        entry = self.entries.pop(id(obj), None)
+        if entry is None:
+            return
+        for word in entry[1]:
+            ids = self.postings[word]
+            ids.discard(id(obj))
+            if not ids:
+                del self.postings[word]
+
+    def query(self, *words, types=(), source=None):
+        """the objects which contain all of the words
+
+        Args:
+            words (str): the words to look for, case insensitively. Each
+                argument can have several words
+            types (type | Tuple[type]): only the objects of these types
+            source: only the objects from this file or page
+
+        Returns:
+            (List[Hit]) the hits, in the order of their sources and positions
+        """
+        wanted = tokens(' '.join(words))
+        if not wanted:
+            return []
+        postings = sorted((self.postings.get(word, ()) for word in wanted), key=len)
+        ids = set(postings[0]).intersection(*postings[1:])
+        hits = [self.entries[i][0] for i in ids]
+        if types:
+            hits = [hit for hit in hits if isinstance(hit.obj, types) or issubclass(hit.typ, types)]
+        if source is not None:
+            hits = [hit for hit in hits if hit.source == source]
+        hits.sort(key=lambda hit: (self.__sources[hit.source], hit.obj.start))
+        return hits
+
+    def on_textobject_added(self, textobject, typ, path):
+        self.add(textobject, path, typ)
+
+    def on_textobject_removed(self, textobject, typ, path):
+        self.remove(textobject)
+
+    def on_textobject_moved(self, textobject, previous_span, typ, path):
+        # the storage reports the new object, which is equal to the one which was indexed
+        words = tokens(textobject)
+        postings = sorted((self.postings.get(word, ()) for word in words), key=len)
+        for i in (postings[0] if postings else ()):
+            hit = self.entries[i][0]
+            if hit.source == path and hit.span == previous_span:
+                self.remove(hit.obj)
+                break
+        self.add(textobject, path, typ)
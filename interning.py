@@ -0,0 +1,216 @@
+"""dictionary encoding of the values captured by a template
+
+Values such as status words, hostnames and tags repeat across many matches,
+but each match holds it's own copy of them. :func:`findall` streams the
+matches from :func:`lib.finditer` and keeps only the span of each match and,
+for each placeholder, a small integer code into a table of the distinct
+values, which are interned::
+
+    Todo = textobjects.create('Todo', 'TODO: <status> <tag>')
+    found = textobjects.findencoded(Todo, text)
+    found[0].status         # 'open'
+    found.values('status')  # ['open', 'done']
+    found.codes('status')   # array('H', [0, 1, 0, ...])
+
+A placeholder whose number of distinct values goes over `max_cardinality`
+is not worth encoding, from then on it's values are kept as plain strings.
+The values are strings, or None for an optional placeholder which was not
+found, or tuples of strings for a repeated placeholder. Nested templates are
+flattened to the text they matched
+"""
+import sys
+from array import array
+from collections import UserList
+from collections.abc import Sequence
+from textobjects import exceptions, lib
+from textobjects.textobject import TextObject, TRANSIENT
+
+MAX_CARDINALITY = 1 << 16
+"""The number of distinct values after which a placeholder is no longer encoded"""
+
+SPAN_ATTRIBUTES = ('data', 'enclosing_text', 'start', 'end', 'others') + TRANSIENT
+"""attributes of a match which are not captured values"""
+
+def capture(value):
+    """the plain value of a captured textobject"""
+    if value is None:
+        return None
+    if isinstance(value, (str, TextObject)) and not isinstance(value, (list, UserList)):
+        return sys.intern(str(value))
+    return tuple(capture(item) for item in value)
+
+def placeholders(Type, obj):
+    """the names of the placeholders of `Type`, the fields of a class from the
+    regex backend or else the captured attributes of the first match `obj`"""
+    fields = getattr(Type, 'fields', None)
+    if fields is not None:
+        return [fld.name for fld in fields]
+    return [name for name, value in vars(obj).items() if name not in SPAN_ATTRIBUTES
+            and (value is None or isinstance(value, (str, TextObject)))]
+
+class Column:
+    """The values of a single placeholder, as codes into a table of the distinct
+    values until there are more than `max_cardinality` of them
+
+    Args:
+        name (str): the name of the placeholder
+        max_cardinality (int): the number of distinct values to encode
+    """
+    __slots__ = ('name', 'max_cardinality', 'table', 'index', 'codes', 'plain')
+
+    def __init__(self, name, max_cardinality=MAX_CARDINALITY):
+        self.name = name
+        self.max_cardinality = max_cardinality
+        self.table = []
+        """the distinct values, in the order they were found"""
+        self.index = {}
+        self.codes = array('H' if max_cardinality <= 1 << 16 else 'L')
+        """the code of each value, None once the column is no longer encoded"""
+        self.plain = None
+        """the values of a column which is no longer encoded"""
+
+    @property
+    def encoded(self):
+        return self.codes is not None
+
+    def append(self, value):
+        if self.codes is None:
+            self.plain.append(value)
+            return
+        code = self.index.get(value)
+        if code is None:
+            if len(self.table) == self.max_cardinality:
+                self.decode()
+                self.plain.append(value)
+                return
+            code = self.index[value] = len(self.table)
+            self.table.append(value)
+        self.codes.append(code)
+
+    def decode(self):
+        """stop encoding the column"""
+        self.plain = [self.table[code] for code in self.codes]
+        self.codes = self.index = None
+        self.table = []
+
+    def __len__(self):
+        return len(self.codes) if self.codes is not None else len(self.plain)
+
+    def __getitem__(self, i):
+        if self.codes is None:
+            return self.plain[i]
+        return self.table[self.codes[i]]
+
+class Record:
+    """A single match of :class:`EncodedResults`, the captured values are
+    available as attributes"""
+    __slots__ = ('results', 'row')
+
+    def __init__(self, results, row):
+        self.results = results
+        self.row = row
+
+    @property
+    def start(self):
+        return self.results.starts[self.row]
+
+    @property
+    def end(self):
+        return self.results.ends[self.row]
+
+    @property
+    def span(self):
+        return (self.start, self.end)
+
+    @property
+    def data(self):
+        """the matched text, sliced from the text which was searched"""
+        return self.results.text[self.start:self.end]
+
+    def __getattr__(self, name):
+        try:
+            column = self.results.columns[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        return column[self.row]
+
+    def asdict(self):
+        return {name: column[self.row] for name, column in self.results.columns.items()}
+
+    def __str__(self):
+        return str(self.data)
+
+    def __repr__(self):
+        return f'Record({self.span}, {self.asdict()})'
+
+class EncodedResults(Sequence):
+    """The matches of a template in a text, with the captured values dictionary encoded
+
+    Args:
+        text (str): the text which was searched
+        names (List[str]): the placeholders to capture
+        max_cardinality (int): see :class:`Column`
+    """
+    def __init__(self, text, names, max_cardinality=MAX_CARDINALITY):
+        self.text = text
+        self.starts = array('q')
+        self.ends = array('q')
+        self.columns = {name: Column(name, max_cardinality) for name in names}
+        """the :class:`Column` of each placeholder"""
+
+    def append(self, obj):
+        """record the span and captured values of a match"""
+        self.starts.append(obj.start)
+        self.ends.append(obj.end)
+        for name, column in self.columns.items():
+            column.append(capture(getattr(obj, name, None)))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [Record(self, row) for row in range(len(self))[i]]
+        return Record(self, range(len(self))[i])
+
+    def values(self, name):
+        """the distinct values of an encoded placeholder"""
+        return self.columns[name].table
+
+    def codes(self, name):
+        """the code of the value of each match, or None if the placeholder is not encoded"""
+        return self.columns[name].codes
+
+    def column(self, name):
+        """the value of each match"""
+        return list(self.columns[name])
+
+def findall(Type, text, names=None, budget=None, max_cardinality=MAX_CARDINALITY):
+    """find each occurrence of `Type` in the text, keeping only the spans
+    and dictionary encoded values
+
+    Args:
+        Type (StructuredText): the textobject class to look for
+        text (str): the text to search
+        names (List[str]): the placeholders to capture, see :func:`placeholders`
+        budget (Budget): limits the work done by the matching
+        max_cardinality (int): see :class:`Column`
+
+    Returns:
+        (EncodedResults) the matches
+
+    Raises:
+        (BudgetExceeded) when the budget runs out, with the matches found
+        before the budget ran out as `partial`
+    """
+    results = None
+    try:
+        for obj in lib.finditer(Type, text, budget):
+            if results is None:
+                results = EncodedResults(
+                    text, placeholders(Type, obj) if names is None else names, max_cardinality)
+            results.append(obj)
+    except exceptions.BudgetExceeded as e:
+        e.partial = results if results is not None else EncodedResults(text, names or [])
+        raise
+    return results if results is not None else EncodedResults(text, names or [], max_cardinality)
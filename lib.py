@@ -1,10 +1,39 @@
-from textobjects import templates, exceptions, regex
+from textobjects import exceptions, regex, lines
+from textobjects import budget as budgets
+from textobjects.budget import Budget
 from textobjects.textobject import StructuredText
 from typing import Iterable, Mapping
 from copy import deepcopy
-
-def create(name, template, post=None, construct=None, scope={}):
-    cls = templates.parse(template, name)
+from itertools import islice
+
+def create(name, template, post=None, construct=None, scope=None, backend=None, memoize=None):
+    """create a textobject class from the template
+
+    Args:
+        name (str): the name of the class
+        template (str): the template string
+        post (Callable): called with each object after it is matched
+        construct (Callable): converts the arguments given to the class into 
+            the arguments for the textobject
+        scope (Mapping): the outer scope for python interpolation
+        backend (str): **'regex'** to lower the template to a single regular expression,
+            **'nodes'** to evaluate the node tree built by :mod:`templates`, or 
+            **'codegen'** to run python code generated from the node tree, see :mod:`codegen`.
+            The node backend is used by default. The regex backend is faster, but it can
+            find different matches for the same template, see :mod:`regex`
+        memoize (int): for the node backend, record the outcome of each node evaluation 
+            during a match, keeping at most this many outcomes
+    """
+    if backend is None or backend == 'nodes':
+        from textobjects import templates
+        cls = templates.parse(template, name, memoize=memoize)
+    elif backend == 'regex':
+        cls = regex.parse(name, template)
+    elif backend == 'codegen':
+        from textobjects import codegen
+        cls = codegen.parse(name, template)
+    else:
+        raise ValueError(f'unknown backend {backend!r}')
     if not post:
         post = lambda o: None
 
@@ -33,6 +62,26 @@ def create(name, template, post=None, construct=None, scope={}):
     cls.__findall__ = __findall__
 
 
+    __finditer = cls.__finditer__
+
+    @classmethod
+    def __finditer__(cls, *args, **kwargs):
+        for obj in __finditer(*args, **kwargs):
+            post(obj)
+            yield obj
+    cls.__finditer__ = __finditer__
+
+    def wrapat(method):
+        @classmethod
+        def at(cls, *args, **kwargs):
+            obj = method(*args, scope=scope, **kwargs)
+            post(obj)
+            return obj
+        return at
+    for attr in ('__matchat__', '__searchat__'):
+        if hasattr(cls, attr):
+            setattr(cls, attr, wrapat(getattr(cls, attr)))
+
     __search = cls.__search__
 
     @classmethod
@@ -42,6 +91,12 @@ def create(name, template, post=None, construct=None, scope={}):
         return obj
     cls.__search__ = __search__
 
+    @classmethod
+    def __render__(cls, values, validate=True):
+        from textobjects import rendering
+        return rendering.renderer(template).construct(cls, values, validate, post)
+    cls.__render__ = __render__
+
     if construct:
         new = cls.__new__
         def __new__(cls, *args, **kwargs):
@@ -55,41 +110,118 @@ def create(name, template, post=None, construct=None, scope={}):
     return cls
 
 def re(name, template):
-    """create a textobject class based on the template
+    """create a textobject class by lowering the template to a single
+    regular expression, see :mod:`regex`"""
+    return regex.parse(name, template)
 
-    .. note::
+def _budget(budget):
+    """the keyword arguments passing the budget on, classes which do not
+    support budgets are only called with it when one is given"""
+    return {} if budget is None else {'budget': budget}
 
-        Only regular placeholders (no wildcards) are supported at this time
+def match(Type: StructuredText, text: str, enclosing=None, budget: Budget=None, cache=None):
+    """match `Type` against the whole text
 
+    Args:
+        cache (cache.ResultCache): where the result is looked up and stored,
+            when the text has no `enclosing` text
     """
-    return regex.parse(name, template)
+    if cache is not None and enclosing is None:
+        return cache.match(Type, text, budget)
+    return Type.__match__(text, enclosing, **_budget(budget))
+
+def search(Type: StructuredText, text, enclosing=None, budget: Budget=None):
+    return Type.__search__(text, enclosing, **_budget(budget))
+
+def _solutions(max_solutions):
+    """check the limit on the number of occurrences"""
+    if max_solutions is not None and max_solutions < 1:
+        raise ValueError(f'max_solutions must be at least 1, not {max_solutions}')
+    return max_solutions
+
+def findall(Type: StructuredText, text, budget: Budget=None, cache=None, max_solutions=None):
+    """find each occurrence of `Type` in the text
+
+    Args:
+        cache (cache.ResultCache): where the results are looked up and stored
+        max_solutions (int): stop once this many occurrences are found, the rest 
+            of the text is not searched and the results are not cached
 
-def match(Type: StructuredText, text: str, enclosing=None):
-    return Type.__match__(text, enclosing)
-
-def search(Type: StructuredText, text, enclosing=None):
-    return Type.__search__(text, enclosing)
-
-def findall(Type: StructuredText, text):
-    return Type.__findall__(text)
-
-def matchlines(Type: StructuredText, text: str) -> Iterable[StructuredText]:
-    lines = text.split('\n')
-    results = []
-    for line in lines:
-        try:
-            m = Type.__match__(line, text)
-            results.append(m)
-        except:
-            pass
-    return results
-
-def searchlines(Type: StructuredText, text: str) -> Iterable[StructuredText]:
-    lines = text.split('\n')
-    results = []
-    for line in lines:
-        try:
-            results.append(search(Type, line, text))
-        except:
-            pass
-    return results
+    Raises:
+        (ValueError) if `max_solutions` is less than 1
+    """
+    if _solutions(max_solutions) is not None:
+        return list(finditer(Type, text, budget, max_solutions))
+    if cache is not None:
+        return cache.findall(Type, text, budget)
+    return Type.__findall__(text, **_budget(budget))
+
+def finditer(Type: StructuredText, text, budget: Budget=None, max_solutions=None):
+    """lazily produce each occurrence of `Type` in the text, at most `max_solutions` of them
+
+    Raises:
+        (ValueError) if `max_solutions` is less than 1
+    """
+    found = Type.__finditer__(text, **_budget(budget))
+    if _solutions(max_solutions) is None:
+        return found
+    return islice(found, max_solutions)
+
+async def afindall(Type: StructuredText, text, executor=None, budget: Budget=None):
+    """asynchronously iterate over each occurrence of `Type` in the text.
+    matching is run in a worker thread which waits while the consumer 
+    falls behind
+
+    Args:
+        Type (StructuredText): the textobject class to look for
+        text (str): the text to search
+        executor (concurrent.futures.Executor): a thread based executor to
+            run the matching in, the shared :func:`aio.io_executor` if None is given
+        budget (Budget): limits the work done by the matching
+    """
+    from textobjects import aio
+    async for obj in aio.stream(finditer(Type, text, budget), executor=executor):
+        yield obj
+
+def findencoded(Type: StructuredText, text, names=None, budget: Budget=None):
+    """find each occurrence of `Type` in the text, keeping the captured values
+    of the placeholders `names`, all of them by default, dictionary encoded.
+    see :mod:`interning`. The text can be bytes for the regex backend, which
+    matches `\\w`, `\\d` and `\\s` as ASCII only, see :func:`regex.encoded`
+
+    Returns:
+        (interning.EncodedResults) the matches
+    """
+    from textobjects import interning
+    return interning.findall(Type, text, names, budget)
+
+def render(Type: StructuredText, values=None, validate=True, **kwargs):
+    """create an instance of `Type` from the values of it's placeholders,
+    given as a mapping or object, or as keyword arguments, see :mod:`rendering`
+
+    Args:
+        validate (bool): check each value against it's placeholder, the rendered
+            text is matched again if False is given
+    """
+    return Type.__render__(kwargs if values is None else values, validate)
+
+def iterlines(Type: StructuredText, text: str, search=False, budget: Budget=None) -> Iterable[StructuredText]:
+    """lazily produce the match of each line of the text, or the first
+    occurrence within each line if `search` is True, see :mod:`lines`"""
+    return lines.iterlines(Type, text, search, budget)
+
+def matchlines(Type: StructuredText, text: str, budget: Budget=None, executor=None) -> Iterable[StructuredText]:
+    """the match of each line of the text which matches, each with it's `lineno`
+
+    Args:
+        executor (concurrent.futures.Executor): match ranges of lines in the executor
+    """
+    return lines.findlines(Type, text, False, budget, executor)
+
+def searchlines(Type: StructuredText, text: str, budget: Budget=None, executor=None) -> Iterable[StructuredText]:
+    """the first occurrence within each line which has one, each with it's `lineno`
+
+    Args:
+        executor (concurrent.futures.Executor): search ranges of lines in the executor
+    """
+    return lines.findlines(Type, text, True, budget, executor)
@@ -0,0 +1,117 @@
+"""match a template against each line of a text
+
+Each line is matched in place within the full text, between the start and
+end of the line, with the class's :func:`__matchat__` or :func:`__searchat__`.
+The lines are found with :func:`str.find` as they are needed, rather than
+splitting the text and locating each line in it again. Each result has the
+attribute `lineno`, the number of the line it was found on counting from 1
+
+Classes which only implement :func:`__match__` and :func:`__search__` are
+given the line and the text, as before. The text can be bytes-like for
+classes which support it, see :mod:`regex`
+"""
+import re
+from textobjects import exceptions
+from textobjects import budget as budgets
+
+LINES_PER_TASK = 10000
+"""The number of lines matched by each task when an executor is used"""
+
+_NEWLINE = re.compile(b'\n')
+
+def newlines(text):
+    """a function ``find(pos, endpos)`` which returns the position of the next 
+    newline, or -1. It is :func:`str.find` unless the text is a memoryview"""
+    if isinstance(text, str):
+        return lambda pos, endpos: text.find('\n', pos, endpos)
+    if hasattr(text, 'find'):
+        return lambda pos, endpos: text.find(b'\n', pos, endpos)
+    def find(pos, endpos):
+        m = _NEWLINE.search(text, pos, endpos)
+        return m.start() if m else -1
+    return find
+
+def offsets(text):
+    """the position of the start of each line"""
+    starts = [0]
+    find, end = newlines(text), len(text)
+    pos = find(0, end)
+    while pos >= 0:
+        starts.append(pos + 1)
+        pos = find(pos + 1, end)
+    return starts
+
+def _finder(Type, search, budget):
+    kwargs = {} if budget is None else {'budget': budget}
+    at = getattr(Type, '__searchat__' if search else '__matchat__', None)
+    if at is not None:
+        return lambda text, pos, endpos: at(text, pos, endpos, **kwargs)
+    method = Type.__search__ if search else Type.__match__
+    return lambda text, pos, endpos: method(text[pos:endpos], text, **kwargs)
+
+def iterlines(Type, text, search=False, budget=None, pos=0, endpos=None, lineno=1):
+    """produce the result for each line which matches
+
+    Args:
+        Type (StructuredText): the textobject class
+        text (str): the text
+        search (bool): search within each line rather than matching from it's start
+        budget (Budget): limits the work done for all of the lines
+        pos (int): the start of the first line to consider
+        endpos (int): where to stop, the end of the text if None is given
+        lineno (int): the number of the line at `pos`
+    """
+    endpos = len(text) if endpos is None else endpos
+    find = _finder(Type, search, budgets.start(budget))
+    nextline = newlines(text)
+    while True:
+        newline = nextline(pos, endpos)
+        end = endpos if newline < 0 else newline
+        try:
+            obj = find(text, pos, end)
+        except exceptions.BudgetExceeded:
+            raise
+        except exceptions.TemplateMatchError:
+            obj = None
+        if obj is not None:
+            obj.lineno = lineno
+            yield obj
+        if newline < 0:
+            return
+        pos = newline + 1
+        lineno += 1
+
+def _collect(Type, text, search, budget, pos, endpos, lineno):
+    return list(iterlines(Type, text, search, budget, pos, endpos, lineno))
+
+def findlines(Type, text, search=False, budget=None, executor=None, lines_per_task=LINES_PER_TASK):
+    """the results of :func:`iterlines` as a list
+
+    Args:
+        executor (concurrent.futures.Executor): if given the lines are split into
+            ranges of `lines_per_task`, which are matched by the executor. The whole
+            text is passed to each task, so a process based executor pays for copying it
+
+    Raises:
+        (BudgetExceeded) when the budget runs out, with the results found
+        before the budget ran out as `partial`
+    """
+    budget = budgets.start(budget)
+    results = []
+    try:
+        if executor is None:
+            results.extend(iterlines(Type, text, search, budget))
+            return results
+        starts = offsets(text)
+        tasks = []
+        for first in range(0, len(starts), lines_per_task):
+            last = first + lines_per_task
+            endpos = starts[last] - 1 if last < len(starts) else len(text)
+            tasks.append(executor.submit(
+                _collect, Type, text, search, budget, starts[first], endpos, first + 1))
+        for task in tasks:
+            results.extend(task.result())
+    except exceptions.BudgetExceeded as e:
+        e.partial = results
+        raise
+    return results
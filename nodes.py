@@ -1,17 +1,16 @@
 import re
 import os
 from textobjects.placeholders import *
-from textobjects.textobject import TextObject, StructuredText, ListTextObject, textobjecttypes
-from textobjects.exceptions import TemplateMatchError
+from textobjects.textobject import TextObject, StructuredText, ListTextObject, TemplateMeta, textobjecttypes
+from textobjects.exceptions import TemplateMatchError, BudgetExceeded
+from textobjects import budget as budgets
 from collections import UserString, UserList
-from anytree import RenderTree, NodeMixin
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from typing import Tuple, Mapping, Sequence
 from functools import wraps
 from copy import deepcopy
-from itertools import takewhile, dropwhile
-from concurrent.futures import ThreadPoolExecutor
+from itertools import takewhile
 
 @dataclass
 class Context:
@@ -26,84 +25,260 @@ class Context:
     should be updated every time some partof the text is matched"""
 
     scope: Mapping 
-    """The outer scope provded for python interpolation"""
+    """The outer scope provded for python interpolation, or None"""
 
     matches: Sequence = field(default_factory=lambda: [])
     """The list of matches which have been discovered so far, 
     they must either be strings, TextObject, or some other
-    subclass of str. These are used in numerical backreferences like \1"""
+    subclass of str. These are used in numerical backreferences like \1.
+    None when the matches are not recorded, see :func:`records`"""
     matchdict: Mapping = field(default_factory=lambda: {})
-    """mapping of placeholder names to their matched values, used for placeholder backreferencing \<name>"""
+    """mapping of placeholder names to their matched values, used for placeholder backreferencing \<name>.
+    None when the matches are not recorded"""
+    memo: 'Memo' = None
+    """The outcomes of the node evaluations so far, if memoization is enabled"""
+    budget: 'budgets.Budget' = None
+    """The running budget which is spent by each node evaluation, if there is one"""
+    endpos: int = None
+    """where the text which can be matched ends, the end of :obj:`fulltext` if None"""
 
     @property
     def text(self):
         """The remaining text which has not yet been considered, computed using :obj:`index`"""
-        return self.fulltext[self.index:]
+        return self.fulltext[self.index:self.endpos]
+
+    @property
+    def stop(self):
+        """the index where the text which can be matched ends"""
+        return len(self.fulltext) if self.endpos is None else self.endpos
 
     @classmethod
-    def default(cls, text:str, scope={}):
+    def default(cls, text:str, scope=None):
         """applys defaut values for each attribute of :class:`Context` based on the given text"""
         return cls(text, text, 0, scope=scope)
 
     @classmethod
-    def enclosing(cls, text, enclosing, scope={}):
+    def enclosing(cls, text, enclosing, scope=None):
         last = list(re.finditer(re.escape(text), enclosing, re.M))[-1]
         ctx = cls(enclosing, text, last.start(), scope=scope)
         return ctx
 
+class Memo:
+    """The memo table for a single top level match. It records the outcome of 
+    evaluating a node at a position, so that the wildcards which retry their
+    children do not evaluate a node at the same position twice. Along with the
+    outcome it records where the node left the context, and the matches the node
+    added to it, so a replayed outcome leaves the context as evaluating it would
+
+    Args:
+        maxsize (int): the maximum number of outcomes to record, once it is 
+            reached nodes are evaluated as usual
+    """
+    __slots__ = ('table', 'maxsize')
+
+    def __init__(self, maxsize=100000):
+        self.table = {}
+        self.maxsize = maxsize
+
+    def __deepcopy__(self, memo):
+        # the copies of the context made by EitherNode share the table
+        return self
+
+    def attempt(self, node, ctx):
+        """attempt the node, or replay the recorded outcome"""
+        key = (id(node), ctx.index)
+        entry = self.table.get(key)
+        if entry is not None:
+            end, result, added, names = entry
+            ctx.index = end
+            if added is not None:
+                ctx.matches.extend(added)
+                ctx.matchdict.update(names)
+            if result.__class__ is Failure:
+                return result
+            return ctx, result
+        recording = ctx.matches is not None
+        if recording:
+            before, bound = len(ctx.matches), dict(ctx.matchdict)
+        outcome = node.attempt(ctx)
+        if len(self.table) < self.maxsize:
+            failed = outcome.__class__ is Failure
+            after = ctx if failed else outcome[0]
+            added = names = None
+            if recording:
+                added = after.matches[before:]
+                names = {name: value for name, value in after.matchdict.items()
+                         if bound.get(name, bound) is not value}
+            self.table[key] = (after.index, outcome if failed else outcome[1], added, names)
+        return outcome
+
+class Failure:
+    """The outcome of a node which did not match. Nodes return it from
+    :func:`attempt` rather than raising, so that failing is cheap. It is only
+    turned into a :class:`TemplateMatchError` by :func:`PatternNode.evaluate`
+    and the textobject classes
+
+    Args:
+        node (PatternNode): the node which did not match
+        index (int): where the node was attempted
+        reason (str | Exception): why it did not match, if known
+    """
+    __slots__ = ('node', 'index', 'reason')
+
+    def __init__(self, node, index, reason=None):
+        self.node = node
+        self.index = index
+        self.reason = reason
+
+    def __repr__(self):
+        return f'Failure({self.node!r}, {self.index})'
+
+    def error(self, ctx=None):
+        """the :class:`TemplateMatchError` to raise for this failure"""
+        reason = self.reason
+        e = TemplateMatchError(ctx, reason if isinstance(reason, str) else 
+                               f'{self.node!r} does not match at {self.index}')
+        if isinstance(reason, BaseException):
+            e.__cause__ = reason
+        return e
+
+def attempt(node, ctx):
+    """attempt the node using the memo table of the context, if it has one,
+    spending a step of the context's budget. A :class:`TemplateMatchError` or
+    IndexError raised by the node, eg. by a nested template, is returned as a
+    :class:`Failure`, any other exception is raised
+
+    Returns:
+        (Tuple[Context, TextObject] | Failure) the outcome
+    """
+    if ctx.budget is not None:
+        ctx.budget.spend(ctx.index)
+    try:
+        if ctx.memo is None:
+            return node.attempt(ctx)
+        return ctx.memo.attempt(node, ctx)
+    except (TemplateMatchError, IndexError) as e:
+        return Failure(node, ctx.index, e)
+
+def interpolates(rt):
+    """whether the tree has an interpolation block, which can read the
+    matches recorded in the context"""
+    return isinstance(rt, SubstitutionNode) or any(interpolates(child) for child in rt.children)
+
 def maketextobject(name, rt):
-    class Temp(StructuredText):
+    def newcontext(cls, text, enclosing, scope, budget=None, pos=None, endpos=None):
+        if pos is None:
+            ctx = Context.enclosing(text, enclosing, scope=scope)
+        else:
+            ctx = Context(enclosing, text, pos, scope=scope)
+        ctx.budget = budget
+        ctx.endpos = endpos
+        if rt.memoize:
+            ctx.memo = Memo(rt.memoize)
+        if not (cls.keepmatches or interpolating):
+            ctx.matches = ctx.matchdict = None
+        return ctx
+
+    def finish(cls, ctx, result):
+        if cls.keepmatches:
+            result.matches = ctx.matches
+            result.matchdict = ctx.matchdict
+        return result
+
+    class Temp(StructuredText, metaclass=TemplateMeta):
         def __new__(cls, text):
             return cls.__match__(text)
 
+        def __init__(self, text):
+            pass
+
         @classmethod
-        def __match__(cls, text, enclosing=None, scope={}):
+        def __match__(cls, text, enclosing=None, scope=None, budget=None):
             if not enclosing:
                 enclosing = text
-            context = Context.enclosing(text, enclosing, scope=scope)
-            _, result = rt.evaluate(context)
-            result.matches = context.matches
-            result.matchdict = context.matchdict
-            return result
+            ctx = newcontext(cls, text, enclosing, scope, budgets.start(budget))
+            ctx, result = rt.evaluate(ctx)
+            return finish(cls, ctx, result)
 
         @classmethod
-        def __search__(cls, text, enclosing=None, scope={}):
+        def __search__(cls, text, enclosing=None, scope=None, budget=None):
             if not enclosing:
                 enclosing = text
             first = rt.firstexpression
             prospects = first.finditer(text)
             ctx = None
+            budget = budgets.start(budget)
             for prospect in prospects:
-                try:
-                    ctx, result = rt.evaluate(Context.enclosing(
-                        text[prospect.start(0):], enclosing, scope=scope))
-                    result.matches = ctx.matches
-                    result.matchdict = ctx.matchdict
+                ctx = newcontext(cls, text[prospect.start(0):], enclosing, scope, budget)
+                outcome = rt.attempt(ctx)
+                if outcome.__class__ is Failure:
+                    continue
+                return finish(cls, *outcome)
+            raise TemplateMatchError(ctx)
 
-                    return result
-                except TemplateMatchError:...
+        @classmethod
+        def __matchat__(cls, text, pos=0, endpos=None, scope=None, budget=None):
+            endpos = len(text) if endpos is None else endpos
+            ctx = newcontext(cls, text[pos:endpos], text, scope, budgets.start(budget), pos, endpos)
+            ctx, result = rt.evaluate(ctx)
+            return finish(cls, ctx, result)
+
+        @classmethod
+        def __searchat__(cls, text, pos=0, endpos=None, scope=None, budget=None):
+            endpos = len(text) if endpos is None else endpos
+            budget = budgets.start(budget)
+            ctx = None
+            for prospect in rt.firstexpression.finditer(text, pos, endpos):
+                ctx = newcontext(cls, text[prospect.start():endpos], text, scope, budget,
+                                 prospect.start(), endpos)
+                outcome = rt.attempt(ctx)
+                if outcome.__class__ is Failure:
+                    continue
+                return finish(cls, *outcome)
             raise TemplateMatchError(ctx)
 
         @classmethod
-        def __findall__(cls, text, enclosing=None, scope={}):
+        def __finditer__(cls, text, enclosing=None, scope=None, budget=None):
+            if not enclosing:
+                enclosing = text
+            first = rt.firstexpression
+            budget = budgets.start(budget)
+            for prospect in first.finditer(text):
+                outcome = rt.attempt(newcontext(
+                    cls, text[prospect.start(0):], enclosing, scope, budget))
+                if outcome.__class__ is Failure:
+                    continue
+                yield finish(cls, *outcome)
+
+        @classmethod
+        def __findall__(cls, text, enclosing=None, scope=None, budget=None):
             if not enclosing:
                 enclosing = text
             first = rt.firstexpression
             prospects = first.finditer(text)
             results = []
+            budget = budgets.start(budget)
+            from concurrent.futures import ThreadPoolExecutor
             def eval_prospect(prospect):
-                try:
-                    ctx, result = rt.evaluate(Context.enclosing(
-                        text[prospect.start(0):], enclosing, scope=scope))
-                    result.matches = ctx.matches
-                    result.matchdict = ctx.matchdict
-                    return result
-                except: ...
+                outcome = attempt(rt, newcontext(
+                    cls, text[prospect.start(0):], enclosing, scope, budget))
+                if outcome.__class__ is Failure:
+                    return None
+                return finish(cls, *outcome)
             with ThreadPoolExecutor() as executor:
-                found = executor.map(eval_prospect, prospects)
-            return [it for it in found if it]
+                outcomes = executor.map(eval_prospect, prospects)
+                try:
+                    for it in outcomes:
+                        if it:
+                            results.append(it)
+                except BudgetExceeded as e:
+                    e.partial = results
+                    raise
+            return results
 
     Temp.__name__ = Temp.__qualname__ = name
+    Temp.__tree__ = rt
+    interpolating = interpolates(rt)
     return Temp
 
 def textobject(name, rt):
@@ -125,9 +300,25 @@ def textobject(name, rt):
         name = 'SomeTextObject'
     return maketextobject(name, rt)
 
-class PatternNode(NodeMixin):
+def templateclasses(rt, path=()):
+    """the class created for each node below `rt`, with the indexes of the
+    children leading to the node"""
+    for i, child in enumerate(rt.children):
+        cls = child.textobjectclass
+        if cls.__dict__.get('__tree__') is child:
+            yield path + (i,), cls
+        yield from templateclasses(child, path + (i,))
+
+_generation = 0
+"""changed whenever a tree is restructured, so the lookaheads cached by the nodes are recomputed"""
+
+class PatternNode:
     """The base node of the template parser
 
+    The nodes form a plain tree, each node holds a tuple of it's children and
+    links to it's neighbouring siblings, which are updated when `parent` or
+    `children` is set. anytree is only used to render a tree, see :func:`render`
+
     Args:
         name (str): The name of the StructuredText subclass 
             produced from this node, and the name of the attribute 
@@ -144,15 +335,77 @@ class PatternNode(NodeMixin):
 
 
     """
-    def __init__(self, name=None, parent=None, children=[]):
+    __slots__ = ('name', 'memoize', 'nextsibling', 'prevsibling', '__parent', '__children',
+                 '__lookahead', '_textobjectclass', '__profile__', '__weakref__')
+
+    def __init__(self, name=None, parent=None, children=()):
         self.name = name
+        self.memoize = None
+        """if set on the root node, the maximum size of the :class:`Memo` used
+        for each top level match"""
+        self.nextsibling = self.prevsibling = None
+        """the neighbouring children of the parent"""
+        self.__parent = None
+        self.__children = ()
+        self.__lookahead = None
         self.parent = parent
         self.children = children
 
+    @property
+    def parent(self):
+        return self.__parent
+
+    @parent.setter
+    def parent(self, parent):
+        if parent is self.__parent:
+            return
+        if self.__parent is not None:
+            self.__parent.children = [child for child in self.__parent.children if child is not self]
+        if parent is not None:
+            parent.children = parent.children + (self,)
+        else:
+            self.__parent = None
+
+    @property
+    def children(self):
+        return self.__children
+
+    @children.setter
+    def children(self, children):
+        global _generation
+        children = tuple(children)
+        for child in children:
+            if child.__parent is not None and child.__parent is not self:
+                child.parent = None
+        for child in self.__children:
+            child.__parent = child.nextsibling = child.prevsibling = None
+        for i, child in enumerate(children):
+            child.__parent = self
+            child.prevsibling = children[i - 1] if i else None
+            child.nextsibling = children[i + 1] if i + 1 < len(children) else None
+        self.__children = children
+        _generation += 1
+
+    def walk(self):
+        """this node and each node below it, in pre order"""
+        yield self
+        for child in self.__children:
+            yield from child.walk()
+
+    def render(self):
+        """the tree drawn as text"""
+        from anytree import RenderTree
+        return str(RenderTree(self))
+
     @property
     def textobjectclass(self):
-        """produce a StructuredText subclass based on this nodes :func:`evaluate` method"""
-        return textobject(self.name, self)
+        """produce a StructuredText subclass based on this nodes :func:`evaluate` method,
+        the class is only created once for each node"""
+        try:
+            return self._textobjectclass
+        except AttributeError:
+            self._textobjectclass = textobject(self.name, self)
+            return self._textobjectclass
 
     @property
     def firstexpression(self):
@@ -161,42 +414,79 @@ class PatternNode(NodeMixin):
                 return child.expression
             return child.firstexpression
 
+    def __following(self, invoked_from):
+        """the first child after `invoked_from`, if it is a child of this node"""
+        if invoked_from is None or invoked_from.__parent is not self:
+            return None
+        return invoked_from.nextsibling
+
     def nextexpression(self, invoked_from=None):
+        child = self.__following(invoked_from)
+        while child is not None:
+            if child.__children:
+                return child.nextexpression(self)
+            if hasattr(child, 'expression'):
+                return child.expression
+            child = child.nextsibling
 
-        try:
-            if self.children:
-                for child in list(dropwhile(lambda it: it != invoked_from, self.children))[1:]:
-                    if child.children:
-                        return child.nextexpression(self)
-                    if hasattr(child, 'expression'):
-                        return child.expression
-        except KeyError: pass
-
-        if not self.parent:
+        if self.__parent is None:
             return self.expression
 
-        return self.parent.nextexpression(self)
+        return self.__parent.nextexpression(self)
 
     def lookahead(self, pattern, invoked_from=None):
         """add a lookahead to the given pattern for the next regex expression in the template"""
-        try:
-            if self.children:
-                for child in list(dropwhile(lambda it: it != invoked_from, self.children))[1:]:
-                    if child.children:
-                        return child.lookahead(pattern)
-                    if hasattr(child, 'expression'):
-                        pattern_str = pattern if isinstance(pattern, str) else pattern.pattern
-                        return re.compile(f'{pattern_str}(?={child.expression.pattern})', re.M)
-        except KeyError: pass
-
-        if not self.parent:
+        child = self.__following(invoked_from)
+        while child is not None:
+            if child.__children:
+                return child.lookahead(pattern)
+            if hasattr(child, 'expression'):
+                pattern_str = pattern if isinstance(pattern, str) else pattern.pattern
+                return re.compile(f'{pattern_str}(?={child.expression.pattern})', re.M)
+            child = child.nextsibling
+
+        if self.__parent is None:
             return re.compile(pattern, re.M) if isinstance(pattern, str) else pattern
 
-        return self.parent.lookahead(pattern, self)
+        return self.__parent.lookahead(pattern, self)
+
+    @property
+    def matcher(self):
+        """the :func:`lookahead` of the node's own expression, which is
+        cached until the tree is restructured"""
+        cached = self.__lookahead
+        if cached is not None and cached[0] == _generation:
+            return cached[1]
+        pattern = self.lookahead(self.expression)
+        self.__lookahead = (_generation, pattern)
+        return pattern
+
+    def __init_subclass__(cls, **kwargs):
+        super(PatternNode, cls).__init_subclass__(**kwargs)
+        if 'evaluate' in cls.__dict__ and 'attempt' not in cls.__dict__:
+            # a node which raises TemplateMatchError from evaluate
+            evaluate = cls.__dict__['evaluate']
+            def attempt(self, ctx):
+                try:
+                    return evaluate(self, ctx)
+                except TemplateMatchError as e:
+                    return Failure(self, ctx.index, e)
+            cls.attempt = attempt
 
     def evaluate(self, ctx: Context) -> Tuple[Context, TextObject]:
+        """:func:`attempt` the node
+
+        Raises:
+            (TemplateMatchError) if the node does not match
+        """
+        outcome = self.attempt(ctx)
+        if outcome.__class__ is Failure:
+            raise outcome.error(ctx)
+        return outcome
+
+    def attempt(self, ctx: Context):
         """create a StructuredText instance based on the child nodes 
-        :func:`evaluate` methods::
+        :func:`attempt` methods::
             
             if the child node has a name, then the returned result will be stored
             as an attribute on the StructuredText instance
@@ -209,22 +499,30 @@ class PatternNode(NodeMixin):
         txtobj = self.textobjectclass.from_context(ctx)
 
         results = {}
+        others = []
+        recording = ctx.matches is not None
         for node in self.children:
+            outcome = attempt(node, ctx)
+            if outcome.__class__ is Failure:
+                return outcome
+            subctx, subobj = outcome
             if node.name:
-                subctx, subobj = node.evaluate(ctx)
                 results[node.name] = subobj
                 if subobj:
                     if isinstance(subobj, StructuredText):
                         subobj.__class__ = node.textobjectclass
-                ctx.matchdict[node.name] = subobj
+                if recording:
+                    ctx.matchdict[node.name] = subobj
             else:
-                subctx, subobj = node.evaluate(ctx)
-                txtobj.others.append(subobj)
+                others.append(subobj)
                 if isinstance(subobj, Mapping):
                     results.update(subobj)
-            ctx.matches.append(subobj)
+            if recording:
+                ctx.matches.append(subobj)
 
         txtobj.__dict__.update(results)
+        if others:
+            txtobj.others = others
 
         txtobj.end = ctx.index
         txtobj.data = ctx.fulltext[txtobj.start:txtobj.end]
@@ -241,6 +539,8 @@ class TextObjectNode(PatternNode):
     """A PatternNode based on the given TextObject subclass. 
     it acts the same as PatternNode but the class produced will be the 
     given class"""
+    __slots__ = ('__class',)
+
     def __init__(self, textobjectclass, *args, **kwargs):
         self.__class = textobjectclass
         super(TextObjectNode, self).__init__(*args, **kwargs)
@@ -255,20 +555,22 @@ class OptionalNode(PatternNode):
     """Each of the child nodes will be evaluated, If they return 
     a result that result will be used, If there is an Exception thrown then
     the attibute with the name `self.name` will be set to None"""
-    def evaluate(self, ctx):
+    __slots__ = ()
+
+    def attempt(self, ctx):
         txtobj = self.textobjectclass.from_context(ctx)
         results = {}
 
         for child in self.children:
-            try:
-                ctx, obj = child.evaluate(ctx)
-                obj.__class__ = child.textobjectclass
-                if child.name:
-                    results[child.name] = obj
-            except:
+            outcome = attempt(child, ctx)
+            if outcome.__class__ is Failure:
                 if child.name:
                     results[child.name] = None
-                pass
+                continue
+            ctx, obj = outcome
+            obj.__class__ = child.textobjectclass
+            if child.name:
+                results[child.name] = obj
 
         if len(results) == 1:
             return ctx, list(results.values())[0]
@@ -279,30 +581,34 @@ class OptionalNode(PatternNode):
 class RepeatNode(PatternNode):
     """Repeat the actions of each of the child nodes
     until they are unsuccessful. The context returned from the 
-    last successful call to :func:`evaluate` will be carried forward"""
-    def evaluate(self, ctx):
+    last successful call to :func:`attempt` will be carried forward"""
+    __slots__ = ()
+
+    def attempt(self, ctx):
         def repeat(child, ctx):
-            items = ListTextObject([], ctx.fulltext, ctx.index, len(ctx.fulltext))
+            items = ListTextObject([], ctx.fulltext, ctx.index, ctx.stop)
             previndex = ctx.index
-            while ctx.index < len(ctx.fulltext):
-                try:
-                    ctx, obj = child.evaluate(ctx)
-                    if isinstance(obj, Mapping):
-                        items.extend(obj.values())
-                    else: 
-                        items.append(obj)
-                    previndex = ctx.index
-                except: 
+            while ctx.index < ctx.stop:
+                outcome = attempt(child, ctx)
+                if outcome.__class__ is Failure:
                     break
+                ctx, obj = outcome
+                if isinstance(obj, Mapping):
+                    items.extend(obj.values())
+                else: 
+                    items.append(obj)
+                previndex = ctx.index
             ctx.index = previndex
             if not items:
-                raise ValueError
+                return Failure(child, previndex, f'{child!r} did not repeat')
             return ctx, items
 
-        txtobj = self.textobjectclass.from_context(ctx)
-        results = ListTextObject([], ctx.fulltext, ctx.index, len(ctx.fulltext))
+        results = ListTextObject([], ctx.fulltext, ctx.index, ctx.stop)
         for child in self.children:
-            ctx, items = repeat(child, ctx)
+            outcome = repeat(child, ctx)
+            if outcome.__class__ is Failure:
+                return outcome
+            ctx, items = outcome
             results.extend(items)
 
         return ctx, results
@@ -312,47 +618,54 @@ class RepeatNode(PatternNode):
         return ListTextObject
 
 class SearchNode(PatternNode):
-    """repeatedly apply the :func:`evaluate` method for each child node, 
+    """repeatedly apply the :func:`attempt` method for each child node, 
     if it succeeds then proceed to the next node, if it fails then advance the text
     by one character and try again, repeat this until either you run out of text
     or all the child nodes have succeeeded"""
-    def evaluate(self, ctx):
+    __slots__ = ()
+
+    def attempt(self, ctx):
         txtobj = self.textobjectclass.from_context(ctx)
-        while ctx.index < len(ctx.fulltext):
-            try:
-                for child in self.children:
-                    ctx, obj = child.evaluate(ctx)
-                    if child.name: 
-                        results[child.name] = obj
-                    elif isinstance(obj, Mapping):
-                        results.update(obj)
-
-                for child in self.children:
-                    if child.name not in results:
-                        continue
+        start = ctx.index
+        while start < ctx.stop:
+            ctx.index = start
+            results = {}
+            for child in self.children:
+                outcome = attempt(child, ctx)
+                if outcome.__class__ is Failure:
+                    break
+                ctx, obj = outcome
+                if child.name: 
+                    results[child.name] = obj
+                elif isinstance(obj, Mapping):
+                    results.update(obj)
+            else:
                 break
-            except:
-                ctx.index += 1
+            start += 1
+        else:
+            ctx.index = start
+            return Failure(self, start, f'{self!r} was not found')
 
         if len(results) == 1:
             return ctx, list(results.values())[0]
 
-        txtobj.__dict__.update(results)
         if not results:
-            raise Exception
+            return Failure(self, start, f'{self!r} has no results')
+        txtobj.__dict__.update(results)
 
         return ctx, txtobj
 
 class EitherNode(PatternNode):
     """evaluate each child node using a copy of the current context and return 
     the result from the first one which is successful. Essentially a logical OR"""
-    def evaluate(self, ctx):
-        results = {}
+    __slots__ = ()
+
+    def attempt(self, ctx):
         for child in self.children:
-            try:
-                return child.evaluate(deepcopy(ctx))
-            except: ...
-        raise ValueError('None of the patterns matched')
+            outcome = attempt(child, deepcopy(ctx))
+            if outcome.__class__ is not Failure:
+                return outcome
+        return Failure(self, ctx.index, 'None of the patterns matched')
 
 def python_interpolation(expr, ctx, available_text):
     """set up the python interpolation enviroment and execute the given code
@@ -370,7 +683,8 @@ def python_interpolation(expr, ctx, available_text):
             'attrs':{},
             'av_text': available_text
     }
-    globs.update(ctx.scope)
+    if ctx.scope:
+        globs.update(ctx.scope)
     if expr[0] == '!':
         exec(expr[1:].strip(), None, globs)
     elif expr[0] == '=':
@@ -389,21 +703,25 @@ as a attribte on the TextObject """
 
 class RegexNode(PatternNode):
     """A PatternNode based on a regular expression"""
-    def __init__(self, name, expression, parent=None, children=[]):
+    __slots__ = ('expression',)
+
+    def __init__(self, name, expression, parent=None, children=()):
         super(RegexNode, self).__init__(name, parent, children)
         self.expression = re.compile(expression, re.M)
 
 class SubstitutionNode(RegexNode):
     """apply any substitution blocks from a template string, this includes
     interpolation, TextObject substitution, and variable substitution (TODO:)"""
-    def __init__(self, name, expresson, substitutions, parent=None, children=[]):
+    __slots__ = ('_expresson', 'expresson', 'substitutions')
+
+    def __init__(self, name, expresson, substitutions, parent=None, children=()):
         self._expresson = expresson
         firstexpresson = takewhile(lambda it: it != '`', expresson)
         firstexpresson = ''.join(firstexpresson)
         super(SubstitutionNode, self).__init__(name, firstexpresson,  parent, children)
         self.substitutions = substitutions
 
-    def evaluate(self, ctx):
+    def attempt(self, ctx):
         txtobj = StructuredText.from_context(ctx)
         exprs = re.split('`', self._expresson)
         exprs = [expr for expr in exprs if expr]
@@ -429,7 +747,7 @@ class SubstitutionNode(RegexNode):
                 with_lookahead = self.lookahead(self.expresson)
                 match = with_lookahead.match(ctx.text)
                 if not match:
-                    raise TemplateMatchError(ctx, f'{with_lookahead} does not match {ctx.text}')
+                    return Failure(self, ctx.index, f'{with_lookahead} does not match {ctx.text}')
                 ctx.index += len(match.group(0))
 
         txtobj.end = ctx.index
@@ -448,10 +766,12 @@ class SubstitutionNode(RegexNode):
 class RegexMatchNode(RegexNode):
     """match the current text to the given expression and
     create a StructuredText from the result"""
-    def evaluate(self, ctx: Context):
-        match = self.lookahead(self.expression).match(ctx.text)
+    __slots__ = ()
+
+    def attempt(self, ctx: Context):
+        match = self.matcher.match(ctx.text)
         if not match:
-            raise TemplateMatchError(ctx)
+            return Failure(self, ctx.index)
         txtobj = StructuredText.from_regex_match(match, ctx)
         txtobj.__class__ = self.textobjectclass
         ctx.index = ctx.index + len(txtobj)
@@ -460,10 +780,12 @@ class RegexMatchNode(RegexNode):
 class RegexSearchNode(RegexNode):
     """search the current text for the given expression and
     create a StructuredText from the result"""
-    def evaluate(self, ctx: Context):
-        match = self.lookahead(self.expression).search(ctx.text)
+    __slots__ = ()
+
+    def attempt(self, ctx: Context):
+        match = self.matcher.search(ctx.text)
         if not match:
-            raise TemplateMatchError(ctx)
+            return Failure(self, ctx.index)
         txtobj = StructuredText.from_regex_match(match, ctx)
         txtobj.__class__ = self.textobjectclass
         text = ctx.fulltext[ctx.index:]
@@ -0,0 +1,97 @@
+"""a piece table text buffer, edits are recorded as pieces of the text
+they came from so they never copy the whole text"""
+from bisect import bisect_right
+
+class PieceTable:
+    """A text buffer made of pieces of the original text and of each
+    inserted string
+
+    The position of each piece is kept in a prefix array so that a position
+    in the text is found with a binary search. The full text is only
+    materialized when it is asked for, and kept until the next edit
+
+    Args:
+        text (str): the initial text
+    """
+    def __init__(self, text=''):
+        self._pieces = [(text, 0, len(text))] if text else []
+        """each piece is (source, start, end), a slice of some source string"""
+        self._starts = [0] if text else []
+        """the position of each piece within the text"""
+        self._length = len(text)
+        self._text = text
+
+    def __len__(self):
+        return self._length
+
+    def __str__(self):
+        return self.text()
+
+    def text(self):
+        """the full text"""
+        if self._text is None:
+            self._text = ''.join(src[a:b] for src, a, b in self._pieces)
+        return self._text
+
+    def __getitem__(self, key):
+        """a window of the text, only the pieces which overlap the window are read"""
+        if not isinstance(key, slice):
+            if key < 0:
+                key += self._length
+            if not 0 <= key < self._length:
+                raise IndexError(key)
+            return self[key:key+1]
+        start, stop, step = key.indices(self._length)
+        if self._text is not None:
+            return self._text[start:stop:step]
+        if stop <= start:
+            return ''
+        segments = []
+        i = self.__find(start)
+        while i < len(self._pieces) and self._starts[i] < stop:
+            src, a, b = self._pieces[i]
+            offset = self._starts[i]
+            segments.append(src[a + max(0, start - offset):a + min(b - a, stop - offset)])
+            i += 1
+        return ''.join(segments)[::step]
+
+    def __find(self, pos):
+        return max(bisect_right(self._starts, pos) - 1, 0)
+
+    def __split(self, pos):
+        """make sure a piece starts at `pos` and return it's index"""
+        if pos >= self._length:
+            return len(self._pieces)
+        i = self.__find(pos)
+        src, a, b = self._pieces[i]
+        offset = pos - self._starts[i]
+        if offset:
+            self._pieces[i:i+1] = [(src, a, a+offset), (src, a+offset, b)]
+            self._starts.insert(i+1, pos)
+            i += 1
+        return i
+
+    def replace(self, start, end, text):
+        """replace the text between `start` and `end` with `text`"""
+        if not 0 <= start <= end <= self._length:
+            raise IndexError((start, end))
+        first = self.__split(start)
+        last = self.__split(end)
+        new = [(text, 0, len(text))] if text else []
+        self._pieces[first:last] = new
+        self._starts[first:last] = [start] if text else []
+        diff = len(text) - (end - start)
+        if diff:
+            starts = self._starts
+            for i in range(first + len(new), len(starts)):
+                starts[i] += diff
+        self._length += diff
+        self._text = None
+
+    def insert(self, pos, text):
+        """insert `text` at `pos`"""
+        self.replace(pos, pos, text)
+
+    def delete(self, start, end):
+        """remove the text between `start` and `end`"""
+        self.replace(start, end, '')
@@ -0,0 +1,184 @@
+"""per node profiling of the evaluation tree of a template
+
+Profiling swaps the class of each node in the tree for an instrumented
+subclass which records every call to :func:`attempt`, so a tree which is
+not being profiled runs exactly as before::
+
+    Todo = textobjects.create('Todo', 'TODO: <item:.*>$', backend='nodes')
+    with profiling.profile(Todo) as prof:
+        textobjects.findall(Todo, text)
+    print(prof.render())
+
+Only the node backend has an evaluation tree, the classes produced by the
+other backends can not be profiled
+"""
+import json
+import threading
+from abc import ABC
+from dataclasses import dataclass, asdict
+from time import perf_counter
+from anytree import RenderTree
+from textobjects.nodes import Failure
+
+@dataclass
+class NodeStats:
+    """The statistics recorded for a single node"""
+    calls: int = 0
+    """the number of times the node was evaluated"""
+    successes: int = 0
+    """the number of evaluations which matched"""
+    failures: int = 0
+    """the number of evaluations which did not match or raised"""
+    time: float = 0.0
+    """the seconds spent evaluating the node, including it's children"""
+    consumed: int = 0
+    """the number of characters consumed by the successful evaluations"""
+
+class ProfileHook(ABC):
+    """receives the measurements of a :class:`Profile` as they are made,
+    eg. to forward them to a metrics system"""
+    def on_node_evaluated(self, node, succeeded, elapsed, consumed):
+        pass
+
+    def on_profile_finished(self, profile):
+        pass
+
+_instrumented = {}
+
+def instrumented(cls):
+    """the instrumented subclass of a node class, created once for each class"""
+    try:
+        return _instrumented[cls]
+    except KeyError:
+        pass
+
+    def attempt(self, ctx):
+        return self.__profile__.record(self, super(sub, self).attempt, ctx)
+
+    # no slots of it's own, so the layout matches and the class of a node can be swapped
+    sub = type(cls.__name__, (cls,), {'attempt': attempt, '__profiled__': cls, '__slots__': ()})
+    sub.__qualname__ = cls.__qualname__
+    sub.__module__ = cls.__module__
+    _instrumented[cls] = sub
+    return sub
+
+def tree(Type):
+    """the root node of the evaluation tree of a textobject class
+
+    Raises:
+        (TypeError) if the class was not produced by the node backend
+    """
+    rt = getattr(Type, '__tree__', None)
+    if rt is None:
+        raise TypeError(f'{Type.__name__} has no evaluation tree, create it with backend="nodes"')
+    return rt
+
+class Profile:
+    """The statistics of each node in an evaluation tree, collected while
+    the profile is enabled
+
+    Args:
+        rt (nodes.PatternNode): the root of the tree to profile
+        hooks (ProfileHook): notified of each evaluation and when the profile is closed
+    """
+    def __init__(self, rt, *hooks):
+        self.rt = rt
+        self.hooks = list(hooks)
+        self.stats = {}
+        """mapping of each node to it's :class:`NodeStats`"""
+        self.__lock = threading.Lock()
+        self.enabled = False
+
+    def nodes(self):
+        return list(self.rt.walk())
+
+    def enable(self):
+        """instrument each node in the tree"""
+        for node in self.nodes():
+            if hasattr(node, '__profile__'):
+                raise RuntimeError(f'{node!r} is already being profiled')
+            self.stats.setdefault(node, NodeStats())
+            node.__profile__ = self
+            node.__class__ = instrumented(node.__class__)
+        self.enabled = True
+        return self
+
+    def disable(self):
+        """restore the original class of each node"""
+        for node in self.nodes():
+            if getattr(node, '__profile__', None) is self:
+                node.__class__ = node.__profiled__
+                del node.__profile__
+        self.enabled = False
+        for hook in self.hooks:
+            hook.on_profile_finished(self)
+
+    def __enter__(self):
+        return self.enable() if not self.enabled else self
+
+    def __exit__(self, *args):
+        self.disable()
+
+    def record(self, node, attempt, ctx):
+        """attempt the node, recording the outcome"""
+        start = ctx.index
+        began = perf_counter()
+        try:
+            outcome = attempt(ctx)
+        except Exception:
+            self.__add(node, False, perf_counter() - began, 0)
+            raise
+        if outcome.__class__ is Failure:
+            self.__add(node, False, perf_counter() - began, 0)
+        else:
+            self.__add(node, True, perf_counter() - began, outcome[0].index - start)
+        return outcome
+
+    def __add(self, node, succeeded, elapsed, consumed):
+        with self.__lock:
+            stats = self.stats[node]
+            stats.calls += 1
+            if succeeded:
+                stats.successes += 1
+                stats.consumed += consumed
+            else:
+                stats.failures += 1
+            stats.time += elapsed
+        for hook in self.hooks:
+            hook.on_node_evaluated(node, succeeded, elapsed, consumed)
+
+    def render(self):
+        """the tree annotated with the statistics of each node"""
+        lines = []
+        for pre, _, node in RenderTree(self.rt):
+            stats = self.stats.get(node, NodeStats())
+            lines.append(f'{pre}{node!r} calls={stats.calls} ok={stats.successes} '
+                         f'failed={stats.failures} time={stats.time*1000:.3f}ms chars={stats.consumed}')
+        return '\n'.join(lines)
+
+    def asdict(self, node=None):
+        """the statistics as nested dictionaries, following the shape of the tree"""
+        node = node or self.rt
+        return {
+            'type': getattr(node, '__profiled__', type(node)).__name__,
+            'name': node.name,
+            **asdict(self.stats.get(node, NodeStats())),
+            'children': [self.asdict(child) for child in node.children],
+        }
+
+    def json(self, **kwargs):
+        """the statistics as a JSON document, the keyword arguments are passed to :func:`json.dumps`"""
+        return json.dumps(self.asdict(), **kwargs)
+
+def profile(Type, *hooks):
+    """start profiling the evaluation tree of a textobject class, use the
+    result as a context manager or call :func:`Profile.disable` to stop
+
+    Args:
+        Type (StructuredText): a class created by the node backend
+        hooks (ProfileHook): notified of each measurement
+
+    Returns:
+        (Profile) the enabled profile
+    """
+    return Profile(tree(Type), *hooks).enable()
@@ -1,10 +1,241 @@
-"""a simple regex implementation of textobject templates"""
+"""a regex implementation of textobject templates
+
+Templates which are made of regular expressions and placeholders, with or
+without wildcards, are lowered to a single regular expression. Nested
+placeholders become named groups prefixed with the name of the enclosing
+placeholder, eg. **<outer:<inner>>** produces the groups `outer` and `outer__inner`.
+Interpolation blocks and backreferences can not be lowered, use :mod:`templates` for those.
+A budget is spent once for each match, a single match can not be interrupted
+
+This backend is opt-in, ``textobjects.create(..., backend='regex')``. It's matches
+do not overlap, and the lowered template backtracks across placeholders like any
+regular expression, while the node backend tries the template at each occurrence
+of it's first expression and only looks ahead to the next expression. So the same
+template can find different matches, eg. **<a:.*> <b:\\d+>** finds **fix bug 12**
+in **fix bug 12 later** with this backend and nothing with the node backend
+
+The text can also be `bytes`, `bytearray` or `memoryview`, eg. a file which
+was read or mapped without decoding it. The template is then matched as bytes
+in the class's :obj:`RegexTextObject.encoding`, the spans are byte offsets and
+only the text of each captured field is decoded. In a bytes pattern `\\w`, `\\d`,
+`\\s` and `\\b` only match ASCII characters, so text with other characters can
+match differently than it does once it is decoded, see :func:`encoded`
+"""
 import re
-from textobjects import textobject, placeholders
+from functools import lru_cache
+from dataclasses import dataclass, field
+from typing import List, Pattern
+from textobjects import placeholders
+from textobjects import budget as budgets
+from textobjects.textobject import TextObject, StructuredText, ListTextObject, TemplateMeta, register
+from textobjects.exceptions import TemplateMatchError, BudgetExceeded
+
+FLAGS = re.M
+"""The flags used to compile the regular expressions"""
+
+ENCODING = 'utf-8'
+"""The default encoding of text which is given as bytes"""
+
+DEFAULT_PLACEHOLDER_SUBEXPR = r'\S+'
+"""The pattern to be substituted when no pattern is specified for the placeholder,
+the same as the default of :mod:`templates`"""
+
+WILDCARDS = {'repeat':'!', 'optional':'?', 'search':'/'}
+"""the supported wildcard modifiers for a placehoder"""
+
+UNSUPPORTED = re.compile(r'`|\\\d|\\<|\(\?P=')
+"""interpolation blocks and backreferences, which can not be lowered to a regex"""
+
+SEARCH = r'[\s\S]*?'
+"""The expression which skips text for the search wildcard"""
+
+ITEM = '__item'
+"""The group name for a single repetition of a repeated placeholder"""
+
+@dataclass
+class Field:
+    """how to build an attribute from a match of the lowered template"""
+    name: str
+    """the name of the placeholder"""
+    group: str
+    """the name of the group which captures the placeholder"""
+    cls: type
+    """the StructuredText subclass produced for the placeholder"""
+    fields: List['Field'] = field(default_factory=list)
+    """the fields of a nested template"""
+    repeat: Pattern = None
+    """matches a single repetition of a repeated placeholder,
+    as the group :obj:`ITEM`"""
+
+def split_placeholder(placeholder):
+    """split the text of a placeholder, without the surrounding brackets, into
+    it's name, subexpression, wildcards and limit. Colons within nested
+    placeholders or within the subexpression are kept
+
+    Returns:
+        (Tuple[str, str, str, int]) the name, subexpression, wildcards and limit
+    """
+    parts, depth, last = [], 0, 0
+    for i, c in enumerate(placeholder):
+        if c == placeholders.PLACEHOLDER_START:
+            depth += 1
+        elif c == placeholders.PLACEHOLDER_END:
+            depth -= 1
+        elif c == ':' and not depth:
+            parts.append(placeholder[last:i])
+            last = i + 1
+    parts.append(placeholder[last:])
+    name, rest = parts[0], parts[1:]
+    wildcards, limit = '', 0
+    wcpattern = '[' + re.escape(''.join(WILDCARDS.values())) + ']+'
+    if len(rest) >= 3 and rest[-1].isdigit() and re.fullmatch(wcpattern, rest[-2]):
+        wildcards, limit, rest = rest[-2], int(rest[-1]), rest[:-2]
+    elif len(rest) >= 2 and re.fullmatch(f'(?:{wcpattern})?\\d*', rest[-1]):
+        wc = re.fullmatch(f'({wcpattern})?(\\d*)', rest[-1])
+        wildcards, limit, rest = wc.group(1) or '', int(wc.group(2) or 0), rest[:-1]
+    if not re.fullmatch(r'\w+', name):
+        raise ValueError(f'invalid placeholder name {name!r}')
+    return name, ':'.join(rest) or DEFAULT_PLACEHOLDER_SUBEXPR, wildcards, limit
+
+def split(template):
+    """break the template up into regular expressions and placeholders
+
+    Returns:
+        (List[Tuple[str, str]]) pairs of (placeholder, None) or (None, regex),
+        placeholders are given without the surrounding brackets
+    """
+    results, depth, last = [], 0, 0
+    for i, c in enumerate(template):
+        if c == placeholders.PLACEHOLDER_START:
+            if not depth:
+                results.append((None, template[last:i]))
+                last = i + 1
+            depth += 1
+        elif c == placeholders.PLACEHOLDER_END and depth:
+            depth -= 1
+            if not depth:
+                results.append((template[last:i], None))
+                last = i + 1
+    if depth:
+        raise ValueError(f'unbalanced placeholder in {template!r}')
+    results.append((None, template[last:]))
+    return [r for r in results if r != (None, '')]
+
+def lower(template, prefix='', capture=True):
+    """produce a regular expression which is equivalent to the template
+
+    Args:
+        template (str): the template string
+        prefix (str): prepended to the group name of each placeholder
+        capture (bool): if False no groups are produced for the placeholders
+
+    Returns:
+        (Tuple[str, List[Field]]) the regular expression, and how to build
+        each attribute from a match of it
+    """
+    parts, fields = [], []
+    for placeholder, expr in split(template):
+        if placeholder is None:
+            parts.append(expr)
+            continue
+        name, subexpr, wildcards, limit = split_placeholder(placeholder)
+        group = prefix + name
+        nested = placeholders.PLACEHOLDER_START in subexpr
+        repeat = WILDCARDS['repeat'] in wildcards
+        search = SEARCH if WILDCARDS['search'] in wildcards else ''
+        body, subfields = (lower(subexpr, group + '__', capture and not repeat)
+                           if nested else (subexpr, []))
+        cls = TemplateMeta(name, (StructuredText,), {})
+        if repeat:
+            quantifier = f'{{1,{limit}}}' if limit else '+'
+            expr = f'(?:{search}(?:{body})){quantifier}'
+            itembody, itemfields = (lower(subexpr, ITEM + '__') if nested else (subexpr, []))
+            item = re.compile(f'{search}(?P<{ITEM}>{itembody})', FLAGS)
+            fld = Field(name, group, cls, [Field(name, ITEM, cls, itemfields)], item)
+        else:
+            expr = body
+            fld = Field(name, group, cls, subfields)
+        if capture:
+            expr = f'(?P<{group}>{expr})'
+            fields.append(fld)
+        else:
+            expr = f'(?:{expr})'
+        if search and not repeat:
+            expr = search + expr
+        if WILDCARDS['optional'] in wildcards:
+            expr = f'(?:{expr})?'
+        parts.append(expr)
+    return ''.join(parts), fields
 
-class RegexTextObject(textobject.StructuredText):
-    def __init_subclass__(cls, regex, *args, **kwargs):
-        cls.pattern = re.compile(regex)
+def supports(template):
+    """True if the template can be lowered to a single regular expression"""
+    if UNSUPPORTED.search(template):
+        return False
+    try:
+        re.compile(lower(template)[0], FLAGS)
+    except (ValueError, re.error):
+        return False
+    return True
+
+@lru_cache(maxsize=None)
+def encoded(pattern, encoding=ENCODING):
+    """the bytes version of a compiled pattern, for matching encoded text.
+    Python only supports ASCII character classes in bytes patterns, so `\\w`, `\\d`,
+    `\\s` and `\\b` do not match the bytes of other characters, eg. **naïve**
+    is two words. Decode the text before matching it when that matters"""
+    return re.compile(pattern.pattern.encode(encoding), pattern.flags & ~re.UNICODE)
+
+def patternfor(pattern, text, encoding=ENCODING):
+    """`pattern`, or it's bytes version if the text is not a str"""
+    return pattern if isinstance(text, str) else encoded(pattern, encoding)
+
+def build(cls, fields, match, start, end, encoding=ENCODING):
+    """create an instance of `cls` for the text between `start` and `end`
+    with an attribute for each of the fields"""
+    text = match.string
+    data = text[start:end]
+    if not isinstance(data, str):
+        # invalid bytes are kept as surrogates so that nothing is lost
+        data = bytes(data).decode(encoding, 'surrogateescape')
+    obj = object.__new__(cls)
+    TextObject.__init__(obj, data, text, start, end)
+    for fld in fields:
+        setattr(obj, fld.name, value(fld, match, encoding))
+    return obj
+
+def value(fld, match, encoding=ENCODING):
+    """the value of a field from a match of the lowered template"""
+    start, end = match.span(fld.group)
+    if start < 0:
+        return None
+    if fld.repeat:
+        items = ListTextObject([], match.string, start, end)
+        item, = fld.fields
+        repeat = patternfor(fld.repeat, match.string, encoding)
+        pos = start
+        while pos < end:
+            m = repeat.match(match.string, pos, end)
+            if not m or m.end() == pos:
+                break
+            items.append(value(item, m, encoding))
+            pos = m.end()
+        return items
+    return build(fld.cls, fld.fields, match, start, end, encoding)
+
+class RegexTextObject(StructuredText, metaclass=TemplateMeta):
+    """A StructuredText matched with a single regular expression"""
+    pattern: Pattern = None
+    """the lowered template"""
+    fields: List[Field] = []
+    """how to build each attribute from a match of :obj:`pattern`"""
+    encoding: str = ENCODING
+    """the encoding of text which is given as bytes"""
+
+    def __init_subclass__(cls, regex=None, fields=(), **kwargs):
+        super(RegexTextObject, cls).__init_subclass__(**kwargs)
+        if regex is not None:
+            cls.pattern = re.compile(regex, FLAGS)
+            cls.fields = list(fields)
 
     def __new__(cls, text):
         return cls.__match__(text)
@@ -13,47 +244,100 @@ class RegexTextObject(textobject.StructuredText):
         pass
 
     @classmethod
-    def __match__(cls, text):
-        m = cls.pattern.match(text)
-        to = object.__new__(cls)
-        super(RegexTextObject, to).__init__(m.group(0), text, m.start(), m.end())
-        for key, val in m.groupdict().items():
-            setattr(to, key, val)
-        to.others = m.groups()
-        return to
+    def __frommatch__(cls, m):
+        obj = build(cls, cls.fields, m, m.start(), m.end(), cls.encoding)
+        if cls.keepmatches:
+            obj.matchdict = {fld.name: getattr(obj, fld.name) for fld in cls.fields}
+            obj.matches = list(obj.matchdict.values())
+        return obj
+
+    @staticmethod
+    def __locate(text, enclosing):
+        """the text to match against, and where the `text` is within it"""
+        if enclosing is None or enclosing is text or not hasattr(enclosing, 'rfind'):
+            return text, 0
+        pos = enclosing.rfind(text)
+        return (enclosing, pos) if pos >= 0 else (text, 0)
+
+    @classmethod
+    def __match__(cls, text, enclosing=None, scope=None, budget=None):
+        enclosing, pos = cls.__locate(text, enclosing)
+        if budget is not None:
+            budgets.start(budget).spend(pos)
+        m = patternfor(cls.pattern, enclosing, cls.encoding).match(enclosing, pos, pos + len(text))
+        if not m:
+            raise TemplateMatchError(None, f'{cls.__name__} does not match {text!r}')
+        return cls.__frommatch__(m)
 
     @classmethod
-    def __search__(cls, text):
-        m = cls.pattern.search(text)
-        to = super(RegexTextObject).__new__(m.group(0), text, m.start(), m.end())
-        for key, val in m.groupdict().items():
-            setattr(to, key, val)
-        to.others = m.groups()
-        return to
+    def __search__(cls, text, enclosing=None, scope=None, budget=None):
+        enclosing, pos = cls.__locate(text, enclosing)
+        if budget is not None:
+            budgets.start(budget).spend(pos)
+        m = patternfor(cls.pattern, enclosing, cls.encoding).search(enclosing, pos, pos + len(text))
+        if not m:
+            raise TemplateMatchError(None, f'{cls.__name__} was not found in {text!r}')
+        return cls.__frommatch__(m)
 
     @classmethod
-    def __findall__(cls, text):
-        matches = cls.pattern.finditer(text)
-        to_list = []
-        for m in matches:
-            to = super(RegexTextObject).__new__(m.group(0), text, m.start(), m.end())
-            for key, val in m.groupdict().items():
-                setattr(to, key, val)
-            to.others = m.groups()
-            to_list.append(to.others)
-        return to_list
+    def __matchat__(cls, text, pos=0, endpos=None, scope=None, budget=None):
+        """match the text at `pos` in place, the match must end by `endpos`"""
+        endpos = len(text) if endpos is None else endpos
+        if budget is not None:
+            budgets.start(budget).spend(pos)
+        m = patternfor(cls.pattern, text, cls.encoding).match(text, pos, endpos)
+        if not m:
+            raise TemplateMatchError(None, f'{cls.__name__} does not match at {pos}')
+        return cls.__frommatch__(m)
+
+    @classmethod
+    def __searchat__(cls, text, pos=0, endpos=None, scope=None, budget=None):
+        """the first occurrence between `pos` and `endpos`"""
+        endpos = len(text) if endpos is None else endpos
+        if budget is not None:
+            budgets.start(budget).spend(pos)
+        m = patternfor(cls.pattern, text, cls.encoding).search(text, pos, endpos)
+        if not m:
+            raise TemplateMatchError(None, f'{cls.__name__} was not found between {pos} and {endpos}')
+        return cls.__frommatch__(m)
+
+    @classmethod
+    def __finditer__(cls, text, enclosing=None, scope=None, budget=None):
+        enclosing, pos = cls.__locate(text, enclosing)
+        budget = budgets.start(budget)
+        pattern = patternfor(cls.pattern, enclosing, cls.encoding)
+        for m in pattern.finditer(enclosing, pos, pos + len(text)):
+            if budget is not None:
+                budget.spend(m.end())
+            if m.end() > m.start():
+                yield cls.__frommatch__(m)
+
+    @classmethod
+    def __findall__(cls, text, enclosing=None, scope=None, budget=None):
+        results = []
+        try:
+            results.extend(cls.__finditer__(text, enclosing, scope, budget))
+        except BudgetExceeded as e:
+            e.partial = results
+            raise
+        return results
 
 def parse(name, template):
-    _placeholders = re.finditer(placeholders.PLACEHOLDER_PATTERN, template)
-    for ph in _placeholders:
-        groups = ph.groupdict()
-        if groups['wildcards'] or groups['limit']:
-            raise NotImplementedError("wildcard modifiers are not implemented for regex textobjects")
-        expr = groups['subexpr'] or placeholders.DEFAULT_PLACEHOLDER_SUBEXPR
-        template = template.replace(ph.group(0), f'(?P<{groups["name"]}>{expr})')
-
-    class Temp(RegexTextObject, regex=template): ...
-    Temp.__name__ = Temp.__qualname__ = name
-    return Temp
+    """create a textobject class by lowering the template to a regular expression
 
+    Raises:
+        (NotImplementedError) when the template can not be lowered, see :func:`supports`
+    """
+    if not supports(template):
+        raise NotImplementedError(f'{template!r} can not be lowered to a regular expression')
+    regex, fields = lower(template)
+
+    class Temp(RegexTextObject, regex=regex, fields=fields): ...
+    Temp.__name__ = Temp.__qualname__ = name
+    return register(Temp, template, 'regex', subclasses=templateclasses(fields))
 
+def templateclasses(fields, path=()):
+    """the class of each field, with the names of the fields leading to it"""
+    for fld in fields:
+        yield path + (fld.name,), fld.cls
+        yield from templateclasses(fld.fields, path + (fld.name,))
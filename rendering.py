@@ -0,0 +1,218 @@
+"""produce the text of a textobject from the values of it's attributes
+
+The template is compiled once into literal text and slots for the
+placeholders, so rendering is a single join::
+
+    Pair = textobjects.create('Pair', '<key:\\w+> = <value:\\w+>')
+    pair = textobjects.render(Pair, key='a', value='b')   # Pair('a = b')
+
+The regular expressions between the placeholders must be literal text, or
+anchors such as `^` and `$` which render as nothing. Each value is validated
+against the subexpression of it's placeholder, and when the rendered text is
+known to match the template the same way the object is built from the
+rendered spans instead of matching the text again, see :class:`Renderer`
+"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Mapping, Pattern
+from textobjects import regex
+from textobjects.textobject import TextObject, StructuredText
+
+ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'f': '\f', 'v': '\v'}
+"""escape sequences which stand for a single character"""
+
+ANCHORS = set('^$') | {'\\A', '\\Z', '\\b', '\\B'}
+"""zero width expressions which render as nothing"""
+
+LAZY = re.compile(r'[*+?}]\?')
+"""a lazy quantifier, which may stop short of the rendered value"""
+
+def literal(expr):
+    """the text which the regular expression `expr` always matches, or None
+    if it can match more than one string"""
+    chars, i = [], 0
+    while i < len(expr):
+        c = expr[i]
+        if c == '\\' and i + 1 < len(expr):
+            escaped = expr[i + 1]
+            i += 2
+            if '\\' + escaped in ANCHORS:
+                continue
+            if escaped in ESCAPES:
+                chars.append(ESCAPES[escaped])
+            elif escaped.isalnum():
+                return None
+            else:
+                chars.append(escaped)
+            continue
+        if c in ANCHORS:
+            i += 1
+            continue
+        if c in '.[]()*+?{}|\\':
+            return None
+        chars.append(c)
+        i += 1
+    return ''.join(chars)
+
+@dataclass
+class Slot:
+    """a placeholder of the template"""
+    name: str
+    pattern: Pattern
+    """the subexpression of the placeholder, used to validate the values"""
+    renderer: 'Renderer' = None
+    """the renderer of a nested template"""
+    optional: bool = False
+    repeat: bool = False
+    search: bool = False
+    following: str = None
+    """the literal text which follows the placeholder, '' at the end of the template"""
+
+class Renderer:
+    """The compiled form of a template for rendering
+
+    Args:
+        template (str): the template string
+
+    Raises:
+        (NotImplementedError) when the template has interpolation blocks,
+        or regular expressions which are not literal text
+    """
+    def __init__(self, template):
+        self.template = template
+        self.parts = []
+        """the literal text and :class:`Slot` of the template in order"""
+        if regex.UNSUPPORTED.search(template):
+            raise NotImplementedError(f'{template!r} has interpolation blocks or backreferences')
+        for placeholder, expr in regex.split(template):
+            if placeholder is None:
+                text = literal(expr)
+                if text is None:
+                    raise NotImplementedError(f'{expr!r} in {template!r} is not literal text')
+                if self.parts and isinstance(self.parts[-1], str):
+                    self.parts[-1] += text
+                elif text:
+                    self.parts.append(text)
+                continue
+            name, subexpr, wildcards, _ = regex.split_placeholder(placeholder)
+            nested = regex.placeholders.PLACEHOLDER_START in subexpr
+            self.parts.append(Slot(
+                name, None if nested else re.compile(subexpr, regex.FLAGS),
+                Renderer(subexpr) if nested else None,
+                regex.WILDCARDS['optional'] in wildcards,
+                regex.WILDCARDS['repeat'] in wildcards,
+                regex.WILDCARDS['search'] in wildcards))
+        for i, part in enumerate(self.parts):
+            if isinstance(part, Slot):
+                after = self.parts[i + 1] if i + 1 < len(self.parts) else ''
+                part.following = after if isinstance(after, str) else None
+        self.slots = [part for part in self.parts if isinstance(part, Slot)]
+        self.roundtrips = all(slot.renderer is None and not (slot.repeat or slot.search)
+                              and slot.following is not None and not LAZY.search(slot.pattern.pattern)
+                              for slot in self.slots)
+        """True if matching the rendered text gives back the rendered values, as
+        far as can be told from the template: each placeholder is plain, greedy and
+        followed by literal text or the end of the template. :func:`construct` also
+        checks that a value could not be extended into the text which follows it"""
+
+    def render(self, values, validate=True):
+        """the text for the values
+
+        Args:
+            values (Mapping | object): the value of each placeholder, by key or attribute.
+                A nested placeholder can be given it's own values, and a repeated
+                placeholder a list of values
+            validate (bool): check each value against the subexpression of it's placeholder
+
+        Raises:
+            (ValueError) if a value is missing or does not match it's placeholder
+        """
+        return ''.join(self._render(values, validate, []))
+
+    def _render(self, values, validate, spans, pos=0):
+        out = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+                pos += len(part)
+                continue
+            value = attribute(values, part.name)
+            if value is None:
+                if not part.optional:
+                    raise ValueError(f'no value for <{part.name}>')
+                spans.append(None)
+                continue
+            items = value if part.repeat and not isinstance(value, str) else [value]
+            start = pos
+            for item in items:
+                text = self.slot(part, item, validate)
+                out.append(text)
+                pos += len(text)
+            spans.append((start, pos))
+        return out
+
+    @staticmethod
+    def slot(part, value, validate):
+        if part.renderer is not None and not isinstance(value, str):
+            return part.renderer.render(value, validate)
+        text = str(value)
+        pattern = part.pattern if part.renderer is None else part.renderer.pattern
+        if validate and not pattern.fullmatch(text):
+            raise ValueError(f'{text!r} does not match <{part.name}>')
+        return text
+
+    @property
+    def pattern(self):
+        """the template lowered to a regular expression, for validating nested values"""
+        return lowered(self.template)
+
+    def construct(self, cls, values, validate=True, post=None):
+        """create an instance of `cls` from the values, without matching the
+        rendered text when the values were validated and it is known to round trip
+
+        Args:
+            cls (StructuredText): a class created from the same template
+            post (Callable): called with an object which was not matched
+        """
+        spans = []
+        text = ''.join(self._render(values, validate, spans))
+        if not validate or not self.roundtrips or self.extends(text, spans):
+            return cls.__match__(text)
+        obj = object.__new__(cls)
+        TextObject.__init__(obj, text, text, 0, len(text))
+        named = {sub.__name__: sub for path, sub in getattr(cls, '__templateclasses__', {}).items()
+                 if len(path) == 1}
+        for slot, span in zip(self.slots, spans):
+            if span is None:
+                setattr(obj, slot.name, None)
+                continue
+            value = object.__new__(named.get(slot.name, StructuredText))
+            TextObject.__init__(value, text[span[0]:span[1]], text, *span)
+            setattr(obj, slot.name, value)
+        if post is not None:
+            post(obj)
+        return obj
+
+    def extends(self, text, spans):
+        """whether any value could be extended into the literal text which follows it"""
+        for slot, span in zip(self.slots, spans):
+            if span is None or not slot.following:
+                continue
+            if slot.pattern.fullmatch(text, span[0], span[1] + 1):
+                return True
+        return False
+
+@lru_cache(maxsize=None)
+def lowered(template):
+    return re.compile(regex.lower(template)[0], regex.FLAGS)
+
+@lru_cache(maxsize=256)
+def renderer(template):
+    """the :class:`Renderer` for the template, compiled once"""
+    return Renderer(template)
+
+def attribute(values, name):
+    if isinstance(values, Mapping):
+        return values.get(name)
+    return getattr(values, name, None)
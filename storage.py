@@ -1,11 +1,12 @@
+import os
 import re
 import asyncio
+import threading
 from pathlib import Path
-from itertools import product
-from textobjects import textobjects
-from collections.abc import MutableSequence
+import textobjects
+from textobjects import aio, compressed
+from collections.abc import MutableSequence, Mapping
 from abc import ABC, abstractmethod
-from watchdog import events, observers
 
 class TextObjectObserver(ABC):
     def on_textobject_removed(self, textobject, typ, path):
@@ -17,7 +18,7 @@ class TextObjectObserver(ABC):
     def on_textobject_added(self, textobject, typ, path):
         pass
 
-class TextObjectStorage(MutableSequence, events.FileSystemEventHandler):
+class TextObjectStorage(MutableSequence):
     """Persistant storage of :class:`textobjects.TextObject` subclasses
     abstracted as a mutable sequence
 
@@ -32,16 +33,29 @@ class TextObjectStorage(MutableSequence, events.FileSystemEventHandler):
             the :obj:`txtobjtypes` in these files will show up in the sequence.
             When a textobject is updated the occurance of it in it's respective file 
             will be replaced.
+
+        invertedindex (index.InvertedIndex): an index of the words in the entries, 
+            which is kept up to date as the files change, if `index` is True
     """
 
-    def __init__(self, txtobjtypes, primaryfile=None, files=[]):
+    def __init__(self, txtobjtypes, primaryfile=None, files=[], index=False):
         self.txtobjtypes = txtobjtypes
         self.primaryfile = Path(primaryfile)
         self.files = [Path(f) for f in files]
         if self.primaryfile not in self.files:
             self.files.append(primaryfile)
         self._entries = None
+        self._updating = threading.RLock()
+        """held by :func:`update`, so that rescans of the storage run one at a time"""
         self.observers = []
+        self._setindex(index)
+
+    def _setindex(self, index):
+        self.invertedindex = None
+        if index:
+            from textobjects.index import InvertedIndex
+            self.invertedindex = InvertedIndex()
+            self.subscribe(self.invertedindex)
 
     def entries(self, updated=False):
         if updated or not self._entries:
@@ -57,21 +71,26 @@ class TextObjectStorage(MutableSequence, events.FileSystemEventHandler):
         else:
             return self.entries().keys()[key]
 
+    def __convert(self, item):
+        """the item as one of the :obj:`txtobjtypes`, a mapping of attribute 
+        values is rendered with the first type which accepts it"""
+        if True in [isinstance(item, typ) for typ in self.txtobjtypes]:
+            return item
+        for typ in self.txtobjtypes:
+            try:
+                if isinstance(item, Mapping):
+                    return textobjects.render(typ, item)
+                return typ(text=item)
+            except:
+                pass
+        raise ValueError(f'{item} is not in a supported format')
+
     def __setitem__(self, key, value):
-            if True not in [isinstance(value, typ) for typ in self.txtobjtypes]:
-                changed = False
-                for typ in self.txtobjtypes:
-                    try:
-                        value = typ(text=item)
-                        changed = True
-                    except:
-                        pass
-                if not changed:
-                    raise ValueError(f'{item} is not in a supported format')
+            value = self.__convert(value)
             obj = self[key]
             (typ, path) = self.entries()[obj]
             start, end = obj.span
-            text = path.read_text()
+            text = compressed.writable(path).read_text()
             text = text[:start] + value + text[end:]
             path.write_text(text)
             self.update()
@@ -80,7 +99,7 @@ class TextObjectStorage(MutableSequence, events.FileSystemEventHandler):
             obj = self[key]
             typ, path = self.entries()[obj]
             start, end = obj.span
-            text = path.read_text()
+            text = compressed.writable(path).read_text()
             text = text[:start] + text[end:].lstrip('\n')
             path.write_text(text)
             self.update()
@@ -89,25 +108,16 @@ class TextObjectStorage(MutableSequence, events.FileSystemEventHandler):
         return str(self.entries())
 
     def insert(self, index, item):
-        if True not in [isinstance(item, typ) for typ in self.txtobjtypes]:
-            changed = False
-            for typ in self.txtobjtypes:
-                try:
-                    item = typ(text=item)
-                    changed = True
-                except:
-                    pass
-            if not changed:
-                raise ValueError(f'{item} is not in a supported format')
+        item = self.__convert(item)
         if index < len(self):
             obj = self[index]
             (typ, path) = self.entries()[obj]
             start, end = obj.span
-            text = path.read_text()
+            text = compressed.writable(path).read_text()
             text = text[:end] + item + text[end:]
             path.write_text(text)
         elif index == len(self):
-            with self.primaryfile.open('a') as pf:
+            with compressed.writable(self.primaryfile).open('a') as pf:
                 pf.write(str(item).strip('\n') + '\n')
         else:
             raise IndexError('index must not exceed len() {len(self)}')
@@ -125,15 +135,67 @@ class TextObjectStorage(MutableSequence, events.FileSystemEventHandler):
     def subscribe(self, observer: TextObjectObserver):
         self.observers.append(observer)
 
-    def on_modified(self, event):
-        if Path(event.src_path).name in [p.name for p in self.files]:
-            self.update()
+    def dispatch(self, event):
+        """handle a watchdog event, so that the storage can be scheduled on an observer"""
+        from watchdog.events import EVENT_TYPE_MODIFIED
+        if event.event_type == EVENT_TYPE_MODIFIED:
+            self.on_modified(event)
 
-    def update(self):
+    def on_modified(self, event):
+        path = Path(event.src_path).resolve()
+        if path in [Path(p).resolve() for p in self.files]:
+            self.update([path])
+
+    def update(self, paths=None):
+        """rescan the storage files for textobjects
+
+        Args:
+            paths (Iterable[str]): only rescan these files, the entries found in 
+                any other file are kept as they are. If None all files are rescanned.
+                Concurrent calls run one after another, so none of the rescans is lost
+        """
+        with self._updating:
+            self.__update(paths)
+
+    def __update(self, paths):
         old = self._entries
-        self._entries = {obj: (typ, p) for (p, typ) in product(self.files, self.txtobjtypes) 
-                        for obj in typ.findall(p.read_text())}
-        self.__determine_changes(old, self._entries)
+        if old is None or paths is None:
+            scan = [Path(p) for p in self.files]
+        else:
+            paths = {Path(p).resolve() for p in paths}
+            scan = [Path(p) for p in self.files if Path(p).resolve() in paths]
+        scanned = {p.resolve() for p in scan}
+
+        new = {}
+        for found in self.__scan(scan):
+            new.update(found)
+        if old is None:
+            self._entries = new
+            self.__determine_changes(None, new)
+            return
+        previous = {obj: (typ, p) for obj, (typ, p) in old.items() 
+                    if Path(p).resolve() in scanned}
+        self._entries = {obj: (typ, p) for obj, (typ, p) in old.items()
+                         if Path(p).resolve() not in scanned}
+        self._entries.update(new)
+        self.__determine_changes(previous, new)
+
+    def __scan(self, paths):
+        """the entries in each of the files, a file is read once for all of the
+        types. Several files are read, and decompressed, in parallel unless
+        this is already running in the I/O pool, see :func:`aio.io_map`"""
+        def scan(p):
+            text = compressed.read_text(p)
+            return {obj: (typ, p) for typ in self.txtobjtypes
+                    for obj in textobjects.findall(typ, text)}
+        if len(paths) < 2:
+            return [scan(p) for p in paths]
+        return aio.io_map(scan, paths)
+
+    async def aupdate(self, paths=None):
+        """like :func:`update` but the files are read and parsed without 
+        blocking the event loop"""
+        await aio.run(self.update, paths)
 
     def __determine_changes(self, old, new):
         added = []
@@ -144,8 +206,10 @@ class TextObjectStorage(MutableSequence, events.FileSystemEventHandler):
             added += newset - oldset
             removed = oldset - newset
 
-            for obj1, obj2 in product(oldset, newset):
-                if obj1 == obj2 and obj1.span != obj2.span:
+            previous = {obj: obj for obj in oldset}
+            for obj2 in newset:
+                obj1 = previous.get(obj2)
+                if obj1 is not None and obj1.span != obj2.span:
                     for obs in self.observers:
                         obs.on_textobject_moved(obj2, obj1.span, *new[obj2])
 
@@ -169,9 +233,11 @@ class TextObjectDirectoryTree(TextObjectStorage):
         glob (str): the glob pattern to look for within the root directory 
         recursive (bool): if true subdirectories will be considered recursivly, equivelant to 
             prepending **/ to the glob
+        index (bool): build an inverted index of the entries as they are loaded, 
+            see :class:`TextObjectStorage`
 
     """
-    def __init__(self, txtobjtypes, writefile, root, glob, recursive=False):
+    def __init__(self, txtobjtypes, writefile, root, glob, recursive=False, index=False):
         self.txtobjtypes = txtobjtypes
         self.primaryfile = Path(writefile)
         if not self.primaryfile.exists():
@@ -187,12 +253,15 @@ class TextObjectDirectoryTree(TextObjectStorage):
             self.files.append(self.primaryfile)
 
         self._entries = None
+        self._updating = threading.RLock()
         self.observers = []
+        self._setindex(index)
         self.update()
 
 class TextObjectStorageSyncronization:
     """Context manager which updates a :obj:`TextObjectStorage`
-    each time any of the underlying files are changed"""
+    each time any of the underlying files are changed. Use ``async with``
+    to watch from the running event loop instead of a background thread"""
 
     def __init__(self, *textobjectstores):
         self.textobjectstores = textobjectstores
@@ -201,46 +270,142 @@ class TextObjectStorageSyncronization:
         self.stopfunc = watch(*self.textobjectstores)
 
     def __exit__(self, type, value, traceback):
-        self.stopfunc
+        self.stopfunc()
+
+    async def __aenter__(self):
+        self.stopfunc = await asyncwatch(*self.textobjectstores)
+
+    async def __aexit__(self, type, value, traceback):
+        await self.stopfunc()
 
 def sync(*textobjectstorage: TextObjectStorage):
     """create a Context Manager which handles syncronization"""
     return TextObjectStorageSyncronization(*textobjectstorage)
 
-def watch(*textobjectstores: TextObjectStorage):
-    """start a co-routine to watch the files assocated to 
-    the :obj:`textobjectstores` an update the TextObjectStorage instances
-    when the files are modified
+def watch(*textobjectstores: TextObjectStorage, debounce=0.1):
+    """watch the files assocated to the :obj:`textobjectstores` and update 
+    the TextObjectStorage instances when the files are modified. The watcher
+    runs on it's own event loop in a background thread
 
     Args:
         *textobjectstores (TextObjectStorage): the TextObjectStorage instances to be updated
+        debounce (float): seconds to wait for further events on a file before updating
 
     Retuns:
-        (Callable) a function which stops the coroutine
+        (Callable) a function which stops the watcher
     """
-    return asyncio.run(asyncwatch(*textobjectstores))
-
-async def asyncwatch(*textobjectstores: TextObjectStorage):
-    obs = observers.Observer()
-    for st, path in [(st, p) for st in textobjectstores for p in st.files]:
-        obs.schedule(st, str(path.parent), recursive=False)
-    async def _watch():
-        obs.start()
-        while obs.is_alive:
-            await asyncio.sleep(0.5)
-    asyncio.create_task(_watch())
-    return lambda: obs.stop()
-
-
-
-
-
-
-
-
-
-
-
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    stop = asyncio.run_coroutine_threadsafe(
+            asyncwatch(*textobjectstores, debounce=debounce), loop).result()
+    async def shutdown():
+        await stop()
+    def _stop():
+        # the observer is joined before the loop is closed, so it can not call into a closed loop
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+    return _stop
+
+class _DebouncedEventHandler:
+    """Deliver watchdog events onto an asyncio event loop, coalescing the 
+    bursts of events an editor emits on save, and the changes to several of
+    it's files, into a single update of each storage.
+    watchdog only calls :func:`dispatch`, so it is not imported until a watch is started
 
+    Args:
+        loop (asyncio.AbstractEventLoop): the loop which the updates are run on
+        debounce (float): seconds to wait for further events on a storage's files
+            before it is updated
+    """
+    def __init__(self, loop, debounce=0.1):
+        from watchdog import events
+        self.changes = (events.EVENT_TYPE_MODIFIED, events.EVENT_TYPE_CREATED, events.EVENT_TYPE_MOVED)
+        """the event types which mean the content of a file may have changed"""
+        self.loop = loop
+        self.debounce = debounce
+        self.stores = {}
+        self.pending = {}
+        """the timer and the changed files of each store which is waiting to be updated"""
+        self.tasks = set()
+        """the updates which are running"""
+        self.closed = False
+
+    def add(self, store, path):
+        """update `store` when the file at `path` changes"""
+        stores = self.stores.setdefault(Path(path).resolve(), [])
+        if store not in stores:
+            stores.append(store)
+
+    @property
+    def directories(self):
+        """the directories which need to be watched, each only once"""
+        return {p.parent for p in self.stores}
+
+    def dispatch(self, event):
+        # called from the observer thread
+        if event.is_directory or event.event_type not in self.changes:
+            return
+        paths = [event.src_path, getattr(event, 'dest_path', None)]
+        for path in [Path(os.fsdecode(p)).resolve() for p in paths if p]:
+            if path in self.stores:
+                self.loop.call_soon_threadsafe(self._schedule, path)
+
+    def _schedule(self, path):
+        if self.closed:
+            return
+        for store in self.stores[path]:
+            handle, paths = self.pending.pop(id(store), (None, set()))
+            if handle:
+                handle.cancel()
+            paths.add(path)
+            self.pending[id(store)] = (self.loop.call_later(self.debounce, self._flush, store), paths)
+
+    def _flush(self, store):
+        # a single update of each store for all of the files which changed within the debounce
+        _, paths = self.pending.pop(id(store))
+        task = self.loop.create_task(store.aupdate(sorted(paths)))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def close(self):
+        """drop any updates which have not been run yet
+
+        Returns:
+            (asyncio.Future) done once the updates which are running have finished
+        """
+        self.closed = True
+        for handle, _ in self.pending.values():
+            handle.cancel()
+        self.pending.clear()
+        return asyncio.gather(*self.tasks, return_exceptions=True)
+
+async def asyncwatch(*textobjectstores: TextObjectStorage, debounce=0.1):
+    """watch the files assocated to the :obj:`textobjectstores` from the 
+    running event loop. Each directory is watched once, and only the 
+    files which changed are rescanned
 
+    Args:
+        *textobjectstores (TextObjectStorage): the TextObjectStorage instances to be updated
+        debounce (float): seconds to wait for further events on a file before updating
 
+    Retuns:
+        (Callable) a function which stops the watcher, it must be called from the event loop.
+        It returns a future which is done once the updates which were running have finished
+    """
+    from watchdog import observers
+    handler = _DebouncedEventHandler(asyncio.get_running_loop(), debounce)
+    for st in textobjectstores:
+        for path in st.files:
+            handler.add(st, path)
+    obs = observers.Observer()
+    for directory in handler.directories:
+        obs.schedule(handler, str(directory), recursive=False)
+    obs.start()
+    def stop():
+        obs.stop()
+        obs.join()
+        return handler.close()
+    return stop
@@ -1,6 +1,8 @@
 import textobjects.nodes as nodes
+from textobjects.textobject import register
 import re
-from typing import List
+import threading
+from typing import NamedTuple
 
 
 wildcards = {'repeat':'!', 'optional':'?', 'search':'/'}
@@ -18,6 +20,19 @@ PLACEHOLDER_PATTERN = re.compile(r"<(?P<name>\w+):?(?P<subexpr>.*?(?=:|>)):?(?P<
 DEFAULT_PLACEHOLDER_SUBEXPR = '\S+'
 """The pattern to be substituted when no pattern is specified for the placeholder eg. (**{name}**)"""
 
+PLAN_CACHE_SIZE = 256
+"""the number of templates kept parsed by :func:`plan`"""
+
+__plans = {}
+__planslock = threading.Lock()
+
+class Placeholder(NamedTuple):
+    """the parts of a placeholder in a template"""
+    name: str
+    subexpr: str
+    wildcards: str
+    limit: str
+
 def apply_wildcards(placeholder, pattern, rt):
     """insert the appropriate nodes in the tree based on the given wildcards"""
     if isinstance(pattern, str):
@@ -27,16 +42,16 @@ def apply_wildcards(placeholder, pattern, rt):
     node = rt
 
     if placeholder:
-        wcards = placeholder['wildcards']
+        wcards = placeholder.wildcards
         for wc in reversed(wcards): 
             if wc == wildcards['optional']:
-                node = nodes.OptionalNode(name=placeholder['name'], parent=node)
+                node = nodes.OptionalNode(name=placeholder.name, parent=node)
             if wc == wildcards['repeat']:
-                node = nodes.RepeatNode(name=placeholder['name'], parent=node)
+                node = nodes.RepeatNode(name=placeholder.name, parent=node)
             if wc == wildcards['search']:
-                node = nodes.SearchNode(name=placeholder['name'], parent=node)
+                node = nodes.SearchNode(name=placeholder.name, parent=node)
 
-    name = placeholder['name'] if placeholder else None
+    name = placeholder.name if placeholder else None
 
     if isinstance(pattern, str):
         if substitutions:
@@ -61,15 +76,38 @@ def __parse(template):
                 parsed = PLACEHOLDER_PATTERN.match(placeholder).groupdict()
                 if not parsed['subexpr']:
                     parsed['subexpr'] = DEFAULT_PLACEHOLDER_SUBEXPR
-                if PLACEHOLDER_START in parsed['subexpr']:
-                    results.append((parsed, __parse(parsed['subexpr'])))
+                parsed = Placeholder(**parsed)
+                if PLACEHOLDER_START in parsed.subexpr:
+                    results.append((parsed, __parse(parsed.subexpr)))
                 else:
-                    results.append((parsed, parsed['subexpr']))
+                    results.append((parsed, parsed.subexpr))
             rstack.append(i+1)
     results.append((None, template[rstack.pop():]))
-    return [r for r in results if r[1]]
+    return tuple(r for r in results if r[1])
 
-def parse(template, name=None, showtree=False, returntree=False):
+def plan(template):
+    """the template broken up into regex sections and placeholder sections,
+    which is cached for each template. The plan is made of tuples, so it can
+    be shared by the classes created from the template and pickled
+
+    Returns:
+        (Tuple) pairs of :class:`Placeholder` and pattern, or placeholder and 
+        nested plan, the placeholder is None for the text between placeholders
+    """
+    with __planslock:
+        found = __plans.get(template)
+    if found is not None:
+        return found
+    found = __parse(template)
+    with __planslock:
+        if template in __plans: # parsed by another thread meanwhile
+            return __plans[template]
+        while len(__plans) >= PLAN_CACHE_SIZE:
+            del __plans[next(iter(__plans))]
+        __plans[template] = found
+    return found
+
+def parse(template, name=None, showtree=False, returntree=False, memoize=None):
     """create a StructuredText class from the given template
     
     Args: 
@@ -80,25 +118,28 @@ def parse(template, name=None, showtree=False, returntree=False):
             will be printed
         returntree (bool): return the root node of the execution tree
             instead of a class
+        memoize (int): record the outcome of each node evaluation during a match,
+            keeping at most this many outcomes, see :class:`nodes.Memo`
 
     Returns:
         (:obj:`StructuredText`) a StructuredText subclass based on the template string
 
     """
-    parsedtemplate = __parse(template)
+    parsedtemplate = plan(template)
     rt = nodes.PatternNode(name)
+    rt.memoize = memoize
     def _parse(rt, parsedtemplate):
         for ph, it in parsedtemplate:
-            name = ph['name'] if ph else None
-            if isinstance(it, List):
+            name = ph.name if ph else None
+            if isinstance(it, tuple):
                 _parse(apply_wildcards(ph, it, rt), it)
             else:
                 apply_wildcards(ph, it, rt)
         return rt
     _parse(rt, parsedtemplate)
     if showtree:
-        print(nodes.RenderTree(rt))
+        print(rt.render())
     if returntree:
         return rt
-    return rt.textobjectclass
+    return register(rt.textobjectclass, template, 'nodes', memoize, nodes.templateclasses(rt))
 
@@ -1,3 +1,4 @@
+import os
 import re
 import time
 import string
@@ -14,3 +15,713 @@ def test_regex_textobject():
 
 test_regex_textobject()
 
+
+def test_storage_watch_debounces_editor_saves(tmp_path):
+    import asyncio
+    from textobjects import storage
+    Todo = textobjects.create('Todo', 'TODO: <item:.*>$')
+    path = tmp_path / 'todo.txt'
+    path.write_text('TODO: a\n')
+    updates = []
+
+    class Storage(storage.TextObjectStorage):
+        def update(self, paths=None):
+            updates.append(paths)
+            super().update(paths)
+
+    st = Storage([Todo], path)
+    st.update()
+
+    async def save_a_few_times():
+        stop = await storage.asyncwatch(st, debounce=0.2)
+        for i in range(4):
+            path.write_text(f'TODO: a\nTODO: {i}\n')
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.6)
+        stop()
+
+    asyncio.run(save_a_few_times())
+    assert updates[1:] == [[path.resolve()]]
+    assert sorted(str(it) for it in st) == ['TODO: 3', 'TODO: a']
+
+def test_storage_watch_stops_cleanly(tmp_path):
+    import asyncio
+    import threading
+    from textobjects import storage
+    Todo = textobjects.create('Todo', 'TODO: <item:.*>$')
+    path = tmp_path / 'todo.txt'
+    path.write_text('TODO: a\n')
+    started, release, finished = threading.Event(), threading.Event(), []
+
+    class Slow(storage.TextObjectStorage):
+        def update(self, paths=None):
+            if paths is not None:
+                started.set()
+                release.wait(5)
+            super().update(paths)
+            finished.append(paths)
+
+    st = Slow([Todo], path)
+    st.update()
+
+    async def stop_while_updating():
+        stop = await storage.asyncwatch(st, debounce=0.01)
+        path.write_text('TODO: b\n')
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        stopped = stop()
+        await asyncio.sleep(0.05)
+        assert not stopped.done()
+        release.set()
+        await stopped
+    asyncio.run(stop_while_updating())
+    assert finished[-1] == [path.resolve()] and [str(it) for it in st] == ['TODO: b']
+
+    for i in range(3):
+        stop = storage.watch(storage.TextObjectStorage([Todo], path), debounce=0)
+        path.write_text(f'TODO: {i}\n')
+        stop()
+
+def test_storage_watch_updates_once_for_files_changed_together(tmp_path):
+    import asyncio
+    from textobjects import storage
+    Todo = textobjects.create('Todo', 'TODO: <item:.*>$')
+    a, b = tmp_path / 'a.txt', tmp_path / 'b.txt'
+    a.write_text('TODO: a0\n')
+    b.write_text('TODO: b0\n')
+    updates = []
+
+    class Storage(storage.TextObjectStorage):
+        def update(self, paths=None):
+            updates.append(paths)
+            super().update(paths)
+
+    st = Storage([Todo], a, [b])
+    st.update()
+
+    async def change_both():
+        stop = await storage.asyncwatch(st, debounce=0.2)
+        a.write_text('TODO: a1\n')
+        b.write_text('TODO: b1\n')
+        await asyncio.sleep(0.6)
+        await stop()
+    asyncio.run(change_both())
+    assert updates[1:] == [sorted([a.resolve(), b.resolve()])]
+    assert sorted(str(it) for it in st) == ['TODO: a1', 'TODO: b1']
+    # rescans of separate files which overlap are both kept
+    from concurrent.futures import ThreadPoolExecutor
+    for i in range(2, 12):
+        a.write_text(f'TODO: a{i}\n')
+        b.write_text(f'TODO: b{i}\n')
+        with ThreadPoolExecutor(2) as executor:
+            list(executor.map(st.update, [[a], [b]]))
+        assert sorted(str(it) for it in st) == [f'TODO: a{i}', f'TODO: b{i}']
+
+def test_async_findall_and_file(tmp_path):
+    import asyncio
+    from textobjects import collections
+    Todo = textobjects.create('Todo', 'TODO: <item:.*>$')
+    path = tmp_path / 'todo.txt'
+    path.write_text('TODO: a\nnope\nTODO: b\n')
+
+    async def main():
+        found = [str(it.item) async for it in textobjects.afindall(Todo, path.read_text())]
+        async with collections.aopen(path, Todo) as page:
+            page[0] = Todo('TODO: c')
+        return found
+
+    assert asyncio.run(main()) == ['a', 'b']
+    assert path.read_text() == 'TODO: c\nnope\nTODO: b\n'
+
+def test_chainsequence_index_translation():
+    from textobjects.collections import ChainSequence
+    chain = ChainSequence([0, 1], [], [2, 3, 4], [5])
+    assert len(chain) == 6
+    assert [chain[i] for i in range(6)] == [0, 1, 2, 3, 4, 5]
+    assert chain[-1] == 5 and chain[-4] == 2
+    assert chain[1:5] == [1, 2, 3, 4]
+    chain.insert(2, 9)
+    del chain[0]
+    assert list(chain) == [1, 9, 2, 3, 4, 5] and chain[1] == 9
+    chain.sort(key=lambda it: -it)
+    assert list(chain) == [9, 5, 4, 3, 2, 1]
+    assert chain.sequences == ([9], [], [5, 4, 3, 2], [1])
+
+def test_document_follows_page_changes():
+    from textobjects.collections import Page, Document
+    Todo = textobjects.create('Todo', 'TODO: <item:.*>$')
+    first, second = Page('TODO: a\nTODO: b\n', Todo), Page('TODO: c\n', Todo)
+    doc = Document(first, second)
+    assert len(doc) == 3 and str(doc[2]) == 'TODO: c'
+    first.append(Todo('TODO: x'))
+    assert len(doc) == 4 and str(doc[2]) == 'TODO: x' and str(doc[3]) == 'TODO: c'
+    del first[0]
+    first.write()
+    assert len(doc) == 3 and [str(it) for it in doc] == ['TODO: b', 'TODO: x', 'TODO: c']
+
+def test_page_write_splices_changes_once():
+    from textobjects.collections import Page
+    Todo = textobjects.create('Todo', 'TODO: <item:.*>$')
+    page = Page('TODO: a\nnote\nTODO: b\nTODO: c\n', Todo)
+    assert page.write() is False
+    page[0] = Todo('TODO: aaa')
+    del page[1]
+    page.append(Todo('TODO: d'))
+    assert page.write() is True
+    assert page.data == 'TODO: aaa\nnote\n\nTODO: c\nTODO: d'
+    page[1] = Todo('TODO: cc')
+    assert page.write() is True
+    assert page.data == 'TODO: aaa\nnote\n\nTODO: cc\nTODO: d'
+    Item = textobjects.create('Item', r'- <item:.*\S>  $')
+    page = Page('- a  \n\n', Item)
+    page.append('- b  ')
+    page.write()
+    assert page.data == '- a  \n- b  ' and page._found[-1][:2] == (6, 11)
+
+def test_page_write_only_separates_objects():
+    from textobjects.collections import Page
+    Todo = textobjects.create('Todo', 'TODO: <item:.*>$')
+    page = Page('', Todo)
+    page.append(Todo('TODO: a'))
+    page.append(Todo('TODO: b'))
+    assert page.write() is True
+    assert page.data == 'TODO: a\nTODO: b' and page._found[0][:2] == (0, 7)
+    page = Page('TODO: a\nTODO: b\n', Todo)
+    page.pop()
+    page.write()
+    assert page.data == 'TODO: a\n'
+    page = Page('TODO: a\nnote\nTODO: b\nTODO: c\n', Todo)
+    del page[1]
+    del page[2]
+    page.write()
+    assert page.data == 'TODO: a\nnote\n'
+
+def test_document_page_edits_shift_spans():
+    from textobjects.documents import Page
+    Todo = textobjects.create('Todo', 'TODO: <item:.*>$')
+    page = Page('TODO: a\nnote\nTODO: b\nTODO: c\n', Todo)
+    page[0] = 'TODO: aaa'
+    del page[1]
+    page.insert(0, 'TODO: x')
+    page.append('TODO: d')
+    assert page.data == 'TODO: aaa\nTODO: x\nnote\nTODO: c\nTODO: d\n'
+    assert [page.data[it.start:it.end] for it in page] == [str(it) for it in page]
+    page.update()
+    assert [str(it) for it in page] == ['TODO: aaa', 'TODO: x', 'TODO: c', 'TODO: d']
+
+def test_document_page_copies_the_objects_it_is_given():
+    from textobjects.documents import Page
+    Pair = textobjects.create('Pair', r'<key:\w+> = <value:\w+>')
+    page = Page('x = y\nbb = 22\ncc = 33\n', Pair)
+    r = Pair('r = 1')
+    page[0] = r
+    page[2] = r
+    page[0] = 'first = 1'
+    assert page.data == 'first = 1\nbb = 22\nr = 1\n' and r.span == (0, 5)
+    assert [page.data[it.start:it.end] for it in page] == [str(it) for it in page]
+    other = Page('a = b\nlonger = value\n', Pair)
+    moved = other[1]
+    page.insert(0, moved)
+    assert moved.span == (6, 20) and page.data == 'first = 1\nlonger = value\nbb = 22\nr = 1\n'
+    assert [page.data[it.start:it.end] for it in page] == [str(it) for it in page]
+
+def test_regex_backend_wildcards_and_nesting():
+    from textobjects.regex import RegexTextObject
+    Entry = textobjects.create('Entry', r'<date:\d+-\d+>:<tags: #<tag:\w+>:!><comment: - <note:.*>:?>$',
+                               backend='regex')
+    assert issubclass(Entry, RegexTextObject)
+    found = textobjects.findall(Entry, '1-2: #a #b - hi\nskip\n3-4: #c\n')
+    assert [str(it.date) for it in found] == ['1-2', '3-4']
+    assert [[str(t.tag) for t in it.tags] for it in found] == [['a', 'b'], ['c']]
+    assert str(found[0].comment.note) == 'hi' and found[1].comment is None
+    assert found[1].start == 21 and found[1].tags[0].tag.start == 27
+    Search = textobjects.create('Search', r'<num:\d+:/!>', backend='regex')
+    assert [str(it) for it in Search('a 1 bb 22').num] == ['1', '22']
+
+def test_codegen_backend_matches_node_backend():
+    template, text = r'<n:\d+> `!attrs["x"] = 1`<w:\w+:!>', 'x 1 ab, 22 b'
+    Nodes = textobjects.create('Nodes', template, backend='nodes')
+    Generated = textobjects.create('Generated', template, backend='codegen')
+    assert 'def _n0(text, pos, ctx):' in Generated.__source__
+    expected = [(str(it), str(it.n), [str(w) for w in it.w]) for it in textobjects.findall(Nodes, text)]
+    found = [(str(it), str(it.n), [str(w) for w in it.w]) for it in textobjects.findall(Generated, text)]
+    assert found == expected == [('1 ab', '1', ['ab']), ('22 b', '22', ['b'])]
+
+def test_memo_replays_node_outcomes():
+    from textobjects import nodes, templates
+    rt = templates.parse('<a:x:?>y', 'Memoized', returntree=True, memoize=1000)
+    assert str(rt.textobjectclass('xy').a) == 'x'
+    calls = []
+    attempt = nodes.RegexMatchNode.attempt
+    def counted(self, ctx):
+        calls.append(ctx.index)
+        return attempt(self, ctx)
+    nodes.RegexMatchNode.attempt = counted
+    try:
+        memo = nodes.Memo()
+        for _ in range(2):
+            ctx, result = memo.attempt(rt, nodes.Context.default('xy'))
+            assert ctx.index == 2 and str(result.a) == 'x'
+        memo = nodes.Memo()
+        for _ in range(2):
+            assert isinstance(memo.attempt(rt, nodes.Context.default('xz')), nodes.Failure)
+    finally:
+        nodes.RegexMatchNode.attempt = attempt
+    assert calls == [0, 1, 0, 0]
+
+def nested_repeat(memoize):
+    # Search(Repeat(item: Repeat(a: x), Optional(b: y)), tail: z), which the
+    # template parser can not nest, so it is built from the nodes
+    from textobjects import nodes
+    rt = nodes.PatternNode('Nested')
+    search = nodes.SearchNode(None, parent=rt)
+    item = nodes.PatternNode('item', parent=nodes.RepeatNode('outer', parent=search))
+    nodes.RegexMatchNode('a', 'x', parent=nodes.RepeatNode('a', parent=item))
+    nodes.RegexMatchNode('b', 'y', parent=nodes.OptionalNode('b', parent=item))
+    nodes.RegexMatchNode('z', 'z', parent=nodes.PatternNode('tail', parent=search))
+    rt.memoize = memoize
+    return rt
+
+def test_memo_bounds_nested_repeats():
+    import pytest
+    from textobjects import nodes
+    from textobjects.exceptions import TemplateMatchError
+    calls = []
+    attempt = nodes.RegexMatchNode.attempt
+    def counted(self, ctx):
+        calls.append((id(self), ctx.index))
+        return attempt(self, ctx)
+    nodes.RegexMatchNode.attempt = counted
+    try:
+        counts = {}
+        for memoize in (None, 100000):
+            for n in (10, 40):
+                calls.clear()
+                with pytest.raises(TemplateMatchError):
+                    nested_repeat(memoize).textobjectclass('xxy' * n + 'w')
+                counts[memoize, n] = len(calls)
+                if memoize:
+                    # each of the 3 regex nodes at most once at each position
+                    assert len(calls) == len(set(calls)) <= 3 * (3 * n + 2)
+        found = [nested_repeat(memoize).textobjectclass('xxyxyqxxyxyz').others[0]
+                 for memoize in (None, 100000)]
+    finally:
+        nodes.RegexMatchNode.attempt = attempt
+    assert counts[None, 40] > 10 * counts[None, 10]
+    assert counts[100000, 40] < 5 * counts[100000, 10]
+    assert [[str(item) for item in it.outer] for it in found] == [['xxy', 'xy']] * 2
+    assert [it.tail.z.start for it in found] == [11, 11]
+
+def test_memo_hits_replay_attributes_and_matches():
+    from textobjects import nodes
+    rt = nested_repeat(1000)
+    item = rt.children[0].children[0].children[0]
+    memo = nodes.Memo()
+    outcomes = []
+    for _ in range(2):
+        ctx = nodes.Context.default('xxyz')
+        ctx, result = memo.attempt(item, ctx)
+        outcomes.append((ctx.index, [str(a) for a in result.a], str(result.b),
+                         [len(m) for m in ctx.matches], sorted(ctx.matchdict)))
+    assert len(memo.table) == 1
+    assert outcomes[0] == outcomes[1] == (3, ['x', 'x'], 'y', [2, 1], ['a', 'b'])
+
+def test_max_solutions_stops_the_search():
+    import pytest
+    matched = []
+    Todo = textobjects.create('Todo', r'TODO: <item:\w+>', post=matched.append)
+    text = ' '.join(f'TODO: t{i}' for i in range(5))
+    found = textobjects.finditer(Todo, text, max_solutions=2)
+    assert [str(it.item) for it in found] == ['t0', 't1'] and len(matched) == 2
+    assert [str(it.item) for it in textobjects.findall(Todo, text, max_solutions=3)] == ['t0', 't1', 't2']
+    assert len(textobjects.findall(Todo, text, max_solutions=10)) == 5
+    for limit in (0, -1):
+        with pytest.raises(ValueError):
+            textobjects.findall(Todo, text, max_solutions=limit)
+
+def test_templates_are_parsed_once():
+    import pickle
+    import pytest
+    from concurrent.futures import ThreadPoolExecutor
+    from textobjects import templates
+    template = r'TODO: <item:\w+> <tags:#\w+\s?:!>'
+    plan = templates.plan(template)
+    assert templates.plan(template) is plan
+    assert pickle.loads(pickle.dumps(plan)) == plan
+    item, tags = plan[1][0], plan[3][0]
+    assert (item.name, item.subexpr, tags.name, tags.wildcards) == ('item', r'\w+', 'tags', '!')
+    with pytest.raises(AttributeError):
+        item.name = 'other'
+    First = textobjects.create('First', template, backend='nodes')
+    Second = textobjects.create('Second', template, backend='nodes')
+    assert str(First('TODO: a #b').item) == str(Second('TODO: a #b').item) == 'a'
+    size = templates.PLAN_CACHE_SIZE
+    names = [f'n{i % (2 * size)}' for i in range(8 * size)]
+    with ThreadPoolExecutor(8) as executor:
+        plans = list(executor.map(templates.plan, [f'<{name}:x>y' for name in names]))
+    assert [p[0][0].name for p in plans] == names
+    assert len(vars(templates)['__plans']) <= size
+
+def test_profile_annotates_each_node():
+    import json
+    from textobjects import profiling, nodes
+    Pair = textobjects.create('Pair', r'<key:\w+> = <value:\w+:?>', backend='nodes')
+    evaluated = []
+
+    class Hook(profiling.ProfileHook):
+        def on_node_evaluated(self, node, succeeded, elapsed, consumed):
+            evaluated.append((node.name, succeeded, consumed))
+
+    with profiling.profile(Pair, Hook()) as prof:
+        textobjects.match(Pair, 'a = b')
+    rt = Pair.__tree__
+    assert type(rt) is nodes.PatternNode
+    stats = prof.asdict()
+    assert (stats['calls'], stats['successes'], stats['consumed']) == (1, 1, 5)
+    assert [child['name'] for child in stats['children']] == ['key', None, 'value']
+    assert ('key', True, 1) in evaluated
+    assert json.loads(prof.json())['type'] == 'PatternNode'
+    assert 'calls=1 ok=1' in prof.render().splitlines()[0]
+
+def test_budget_aborts_with_partial_results():
+    import pytest
+    from textobjects import Budget
+    from textobjects.exceptions import BudgetExceeded
+    text = 'a = b\n' * 20
+    for backend in ('regex', 'nodes', 'codegen'):
+        Pair = textobjects.create('Pair', r'<key:\w+> = <value:\w+>', backend=backend)
+        assert len(textobjects.findall(Pair, text, budget=Budget(steps=10**6))) == 20
+        with pytest.raises(BudgetExceeded) as e:
+            textobjects.findall(Pair, text, budget=Budget(steps=10))
+        assert e.value.reason == 'steps' and 0 < e.value.index < len(text)
+        assert all(str(it) == 'a = b' for it in e.value.partial)
+    Repeat = textobjects.create('Repeat', r'<words:\w+ :!>', backend='nodes')
+    with pytest.raises(BudgetExceeded) as e:
+        textobjects.match(Repeat, 'word ' * 10000, budget=Budget(timeout=0))
+    assert e.value.reason == 'timeout'
+    assert len(textobjects.matchlines(Pair, text, budget=Budget(steps=10**6))) == 20
+
+def test_import_is_lazy(tmp_path):
+    import sys
+    import subprocess
+    code = '\n'.join([
+        'import sys, textobjects',
+        'Foo = textobjects.create("Foo", "foo<bar:cat>", backend="regex")',
+        'textobjects.findall(Foo, "foocat")',
+        'heavy = ["anytree", "watchdog", "asyncio", "concurrent.futures", "textobjects.nodes"]',
+        'print(",".join(m for m in heavy if m in sys.modules))',
+    ])
+    env = dict(os.environ, PYTHONPATH=str(Path(textobjects.__file__).parent.parent))
+    out = subprocess.run([sys.executable, '-c', code], cwd=tmp_path, env=env,
+                         capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ''
+    assert textobjects.Page is textobjects.collections.Page
+
+def test_pickle_classes_and_results(tmp_path):
+    import sys
+    import pickle
+    import subprocess
+    text = 'a = b c\n' * 3
+    templates = {'regex': r'<key:\w+> = <value:<first:\w+> <second:\w+>>',
+                 'nodes': r'<key:\w+> = <value:\w+ \w+:?>',
+                 'codegen': r'<key:\w+> = <value:\w+ \w+:?>'}
+    for backend, template in templates.items():
+        Pair = textobjects.create('Pair', template, backend=backend)
+        assert pickle.loads(pickle.dumps(Pair)) is Pair
+        found = textobjects.findall(Pair, text)
+        data = pickle.dumps(found)
+        assert data.count(text.encode()) == 0
+        restored = pickle.loads(data)
+        assert restored == found and [it.span for it in restored] == [it.span for it in found]
+        assert type(restored[1].value) is type(found[1].value)
+        assert restored[1].value == 'b c' and restored[1].enclosing_text is None
+    assert restored[0].value.__class__.__owner__ is Pair
+
+    path = tmp_path / 'found.pickle'
+    path.write_bytes(pickle.dumps(textobjects.findall(textobjects.create('Pair', templates['regex'], backend='regex'), text)))
+    code = ('import pickle, sys; found = pickle.loads(open(sys.argv[1], "rb").read()); '
+            'print(type(found[0]).__backend__, found[2].value.first, found[2].start)')
+    env = dict(os.environ, PYTHONPATH=str(Path(textobjects.__file__).parent.parent))
+    out = subprocess.run([sys.executable, '-c', code, str(path)], cwd=tmp_path, env=env,
+                         capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ['regex', 'b', '16']
+
+def test_lines_are_matched_in_place():
+    from concurrent.futures import ThreadPoolExecutor
+    from textobjects import Budget, lines
+    text = 'TODO: a\nnote\nTODO: a\n  TODO: b\n'
+    for backend in ('regex', 'nodes', 'codegen'):
+        Todo = textobjects.create('Todo', r'TODO: <item:\w+>', backend=backend)
+        found = textobjects.matchlines(Todo, text)
+        assert [(it.lineno, it.start, str(it.item)) for it in found] == [(1, 0, 'a'), (3, 13, 'a')]
+        found = textobjects.searchlines(Todo, text)
+        assert [(it.lineno, it.start) for it in found] == [(1, 0), (3, 13), (4, 23)]
+    with ThreadPoolExecutor(2) as executor:
+        found = lines.findlines(Todo, text * 50, executor=executor, lines_per_task=7)
+        assert found == textobjects.matchlines(Todo, text * 50, executor=executor)
+    assert [it.lineno for it in found][-2:] == [197, 199]
+    assert [it.lineno for it in textobjects.iterlines(Todo, text, search=True)] == [1, 3, 4]
+    assert textobjects.matchlines(Todo, text, budget=Budget(steps=100))
+
+def test_regex_backend_matches_bytes():
+    Entry = textobjects.create('Entry', r'<word:\w+> é<tags: #<tag:\w+>:!>', backend='regex')
+    text = 'ünï\nfoo é #a #b\nbar é #c\n'
+    data = text.encode()
+    for buffer in (data, bytearray(data), memoryview(data)):
+        found = textobjects.findall(Entry, buffer)
+        assert [str(it) for it in found] == ['foo é #a #b', 'bar é #c']
+        assert [str(t.tag) for t in found[0].tags] == ['a', 'b']
+        assert found[1].span == (data.index(b'bar'), len(data) - 1)
+        assert data[slice(*found[0].tags[1].span)] == b' #b'
+        assert [it.lineno for it in textobjects.matchlines(Entry, buffer)] == [2, 3]
+    Latin = textobjects.create('Latin', r'<word:\w+> é', backend='regex')
+    Latin.encoding = 'latin-1'
+    assert str(textobjects.match(Latin, 'foo é'.encode('latin-1'))) == 'foo é'
+    Word = textobjects.create('Word', r'<word:\w+>', backend='regex')
+    # the character classes of a bytes pattern are ASCII only
+    assert [str(w) for w in textobjects.findall(Word, 'naïve')] == ['naïve']
+    assert [w.span for w in textobjects.findencoded(Word, 'naïve'.encode())] == [(0, 2), (4, 6)]
+
+def test_failed_prospects_do_not_raise():
+    import pytest
+    from textobjects import nodes
+    from textobjects.exceptions import TemplateMatchError
+    text = 'a = 1\nb = \nc = 3\n' * 10
+    errors = []
+    error = nodes.Failure.error
+    def counted(self, ctx=None):
+        errors.append(self)
+        return error(self, ctx)
+    nodes.Failure.error = counted
+    try:
+        for backend in ('nodes', 'codegen'):
+            Pair = textobjects.create('Pair', r'<key:\w+> = <value:\d+:?>!', backend=backend)
+            assert len(textobjects.findall(Pair, text)) == 0
+            Pair = textobjects.create('Pair', r'<key:\w+> = <value:\d+>', backend=backend)
+            assert [str(it.value) for it in textobjects.findall(Pair, text)][:2] == ['1', '3']
+        assert errors == []
+        with pytest.raises(TemplateMatchError):
+            textobjects.match(Pair, 'b = ')
+    finally:
+        nodes.Failure.error = error
+
+def test_matches_are_scoped_to_each_match():
+    from textobjects.textobject import TextObject
+    text = 'a = 1\nb = 2\n'
+    for backend in ('regex', 'nodes', 'codegen'):
+        Pair = textobjects.create('Pair', r'<key:\w+> = <value:\d+>', backend=backend)
+        first, second = textobjects.findall(Pair, text)
+        assert (second.matchdict['key'], second.matchdict['value']) == ('b', '2')
+        assert first.matchdict['key'] == 'a' and first.matches is not second.matches
+        Pair.keepmatches = False
+        found = textobjects.findall(Pair, text)
+        assert [str(it.value) for it in found] == ['1', '2']
+        assert not any(hasattr(it, 'matches') or hasattr(it, 'matchdict') for it in found)
+    assert TextObject.others == ()
+    Seen = textobjects.create('Seen', r'<key:\w+>`={"n": len(context.matches)}`', backend='nodes')
+    Seen.keepmatches = False
+    assert textobjects.match(Seen, 'a').n == 1 and not hasattr(textobjects.match(Seen, 'a'), 'matches')
+
+def test_findencoded_shares_repeated_values():
+    from textobjects import interning
+    text = ''.join(f'TODO: {status} host{i % 3} #{i}\n' for i, status in
+                   zip(range(300), ['open', 'done', 'open'] * 100))
+    for backend in ('regex', 'nodes'):
+        Todo = textobjects.create('Todo', r'TODO: <status:\w+> <host:\w+> #<n:\d+>', backend=backend)
+        found = textobjects.findencoded(Todo, text)
+        assert len(found) == 300 and found.values('status') == ['open', 'done']
+        assert list(found.codes('host')[:4]) == [0, 1, 2, 0]
+        assert (found[1].status, found[1].host, found[-1].n) == ('done', 'host1', '299')
+        assert found[0].span == textobjects.findall(Todo, text)[0].span
+        assert found.column('status')[2] is found.column('status')[0]
+    found = interning.findall(Todo, text, ['n'], max_cardinality=10)
+    assert found.codes('n') is None and found.column('n')[:3] == ['0', '1', '2']
+    assert str(found[2]) == 'TODO: open host2 #2'
+
+def test_render_builds_objects_without_matching():
+    import pytest
+    from textobjects.documents import Page
+    for backend in ('regex', 'nodes', 'codegen'):
+        Pair = textobjects.create('Pair', r'<key:\w+> = <value:\w+:?>', backend=backend)
+        match = Pair.__match__
+        Pair.__match__ = None
+        try:
+            pair = textobjects.render(Pair, key='a', value='b')
+        finally:
+            Pair.__match__ = match
+        assert type(pair) is Pair and str(pair) == 'a = b' and pair.value.span == (4, 5)
+        assert type(pair.key) is type(textobjects.match(Pair, 'a = b').key)
+        assert textobjects.render(Pair, {'key': 'a'}).value is None
+        with pytest.raises(ValueError):
+            textobjects.render(Pair, key='a b', value='c')
+    Loose = textobjects.create('Loose', r'<key:.*> = <value:\w+>')
+    assert str(textobjects.render(Loose, key='a = b', value='c').key) == 'a = b'
+    Tags = textobjects.create('Tags', r'tags:<tags: <tag:\w+>:!>', backend='regex')
+    assert str(textobjects.render(Tags, tags=[{'tag': 'a'}, {'tag': 'b'}])) == 'tags: a b'
+    page = Page('x = y\n', Pair)
+    page.insert(1, {'key': 'c', 'value': 'd'})
+    assert page.data == 'x = y\nc = d\n' and str(page[1].key) == 'c'
+
+def test_compressed_files_are_read_transparently(tmp_path):
+    import io
+    import gzip
+    import bz2
+    import lzma
+    import pytest
+    from textobjects import compressed, documents
+    from textobjects.storage import TextObjectStorage
+    Todo = textobjects.create('Todo', r'TODO: <item:\w+>')
+    text = ''.join(f'TODO: item{i}\nnote\n' for i in range(500))
+    paths = [tmp_path / 'a.txt.gz', tmp_path / 'b.bz2', tmp_path / 'c']
+    paths[0].write_bytes(gzip.compress(text.encode()))
+    paths[1].write_bytes(bz2.compress(text.encode()))
+    paths[2].write_bytes(lzma.compress(text.encode()))
+    assert [compressed.codec(p) for p in paths] == ['gzip', 'bz2', 'xz']
+    found = compressed.findall(Todo, paths, blocksize=100)
+    assert [len(it) for it in found.values()] == [500] * 3
+    assert [str(it.item) for it in compressed.iterfind(Todo, paths[2], blocksize=64)][-1] == 'item499'
+    with documents.glob(tmp_path, '*', Todo) as doc:
+        assert len(doc) == 1500
+    store = TextObjectStorage([Todo], paths[2])
+    assert len(store) == 500
+    with pytest.raises(io.UnsupportedOperation):
+        store.insert(len(store), 'TODO: more')
+    with pytest.raises(io.UnsupportedOperation):
+        with textobjects.open(paths[0], Todo) as page:
+            page[0] = Todo('TODO: changed')
+
+def test_inverted_index_follows_edits(tmp_path):
+    from textobjects import documents
+    from textobjects.storage import TextObjectDirectoryTree
+    Todo = textobjects.create('Todo', r'TODO: <item:.*>$')
+    Note = textobjects.create('Note', r'NOTE: <text:.*>$')
+    (tmp_path / 'a.md').write_text('TODO: deploy the site\nNOTE: deploy later\n')
+    (tmp_path / 'b.md').write_text('TODO: write docs\nTODO: Deploy docs\n')
+    with documents.glob(tmp_path, '*.md', Todo, Note, index=True) as doc:
+        index = doc.invertedindex
+        hits = index.query('deploy')
+        assert [hit.source for hit in hits] == sorted([hit.source for hit in hits], 
+                                                      key=[pg.path for pg in doc.pages].index)
+        assert sorted((hit.source.name, str(hit.obj)) for hit in hits) == [
+            ('a.md', 'NOTE: deploy later'), ('a.md', 'TODO: deploy the site'), ('b.md', 'TODO: Deploy docs')]
+        assert [hit.span for hit in index.query('deploy docs', types=Todo)] == [(17, 34)]
+        page = doc.pages[0] if doc.pages[0].path.name == 'a.md' else doc.pages[1]
+        page[0] = Todo('TODO: fix the build')
+        page.insert(len(page), 'TODO: deploy again')
+        assert [str(hit.obj) for hit in index.query('deploy', types=Todo, source=page.path)] == ['TODO: deploy again']
+        assert index.query('build')[0].span == page[0].span
+        del page[0]
+        assert not index.query('build')
+    store = TextObjectDirectoryTree([Todo], tmp_path / 'a.md', tmp_path, '*.md', index=True)
+    assert len(store.invertedindex.query('deploy')) == 2
+    (tmp_path / 'b.md').write_text('\nTODO: Deploy docs\nTODO: deploy now\n')
+    store.update()
+    hits = store.invertedindex.query('deploy', source=tmp_path / 'b.md')
+    assert [(str(hit.obj), hit.span) for hit in hits] == [('TODO: Deploy docs', (1, 18)), ('TODO: deploy now', (19, 35))]
+
+def test_result_cache_reuses_unchanged_text(tmp_path):
+    from textobjects import documents
+    from textobjects.cache import ResultCache
+    Pair = textobjects.create('Pair', r'<key:\w+> = <value:\w+:?>')
+    text = 'a = 1\nb = 2\n'
+    results = ResultCache(maxsize=1, directory=tmp_path)
+    first = textobjects.findall(Pair, text, cache=results)
+    again = textobjects.findall(Pair, text, cache=results)
+    assert (results.hits, results.misses) == (1, 1)
+    assert [(str(p), p.span, str(p.value)) for p in again] == [(str(p), p.span, str(p.value)) for p in first]
+    assert again[0].enclosing_text is text and again[0].value.enclosing_text is text
+    assert str(textobjects.match(Pair, 'c = 3', cache=ResultCache(directory=tmp_path)).key) == 'c'
+    # the memory holds a single result, the first is read back from the disk
+    assert str(ResultCache(directory=tmp_path).findall(Pair, text)[1].key) == 'b'
+    try:
+        textobjects.match(Pair, '= =', cache=results)
+    except textobjects.exceptions.TemplateMatchError:
+        pass
+    page = documents.Page(text, Pair, find=results.findall)
+    page.update()
+    assert [str(p.key) for p in page] == ['a', 'b'] and results.hits == 3
+    small = ResultCache(directory=tmp_path / 'small', max_bytes=1)
+    small.findall(Pair, text)
+    assert not list((tmp_path / 'small').glob('*.pickle'))
+
+def test_nodes_link_their_siblings():
+    from textobjects import nodes, templates
+    rt = templates.parse(r'<key:\w+> = <value:\w+:?>', 'Pair', returntree=True)
+    key, sep, value = rt.children
+    assert (key.nextsibling, sep.prevsibling, value.nextsibling) == (sep, key, None)
+    assert [node.name for node in rt.walk()] == ['Pair', 'key', None, 'value', 'value']
+    assert key.matcher.pattern == r'\w+(?= = )' and key.matcher is key.matcher
+    extra = nodes.RegexMatchNode(None, ';', parent=rt)
+    assert value.nextsibling is extra and rt.children[-1] is extra
+    sep.parent = None
+    # the lookahead skips over the nested value, as it always has
+    assert key.nextsibling is value and key.matcher.pattern == r'\w+(?=;)'
+    assert str(rt.textobjectclass('ab;').key) == 'ab' and rt.textobjectclass is rt.textobjectclass
+
+def test_lines_do_not_match_across_line_ends():
+    for backend in ('regex', 'nodes', 'codegen'):
+        Pair = textobjects.create('Pair', r'<x:\w+>\s<y:\w+>', backend=backend)
+        for find in (textobjects.matchlines, textobjects.searchlines):
+            found = list(find(Pair, 'a\nb c\nd'))
+            assert [(str(p), p.span) for p in found] == [('b c', (2, 5))], backend
+
+def test_errors_after_matching_a_line_are_raised():
+    import pytest
+    def post(todo):
+        if str(todo.item) == 'b':
+            raise KeyError(todo.item)
+    for backend in ('regex', 'nodes', 'codegen'):
+        Todo = textobjects.create('Todo', r'TODO: <item:\w+>', post=post, backend=backend)
+        assert [str(it.item) for it in textobjects.iterlines(Todo, 'TODO: a\nnote\n')] == ['a']
+        for find in (textobjects.iterlines, textobjects.matchlines, textobjects.searchlines):
+            with pytest.raises(KeyError):
+                list(find(Todo, 'TODO: a\nnote\nTODO: b\n'))
+
+def test_default_backend_matches_node_backend():
+    from textobjects.nodes import PatternNode
+    cases = {r'<a> <b>': 'x y z w',
+             r'<key:\w+> = <value:\w+:?>': 'a = 1\nb = \nc = 3 = 4\n',
+             r'TODO: <item:.*>$': 'TODO: a\n  TODO: b TODO: c\n',
+             r'<x:a:!>b': 'aaab',
+             r'<words:\w+\s*:!:2>': 'one two three four five',
+             # the regex backend backtracks across the placeholders
+             r'<a:.*> <b:\d+>': 'fix bug 12 later',
+             r'<a:x|xy>y<b:z>': 'xyyz',
+             r'<a:\w+>\b<b:.*>': 'ab cd'}
+    for template, text in cases.items():
+        Default = textobjects.create('Default', template)
+        Nodes = textobjects.create('Nodes', template, backend='nodes')
+        assert isinstance(Default.__tree__, PatternNode)
+        found = [(str(it), it.span) for it in textobjects.findall(Default, text)]
+        assert found == [(str(it), it.span) for it in textobjects.findall(Nodes, text)], template
+    assert not textobjects.findall(textobjects.create('Fix', r'<a:.*> <b:\d+>'), 'fix bug 12 later')
+    Regex = textobjects.create('Fix', r'<a:.*> <b:\d+>', backend='regex')
+    assert [str(it) for it in textobjects.findall(Regex, 'fix bug 12 later')] == ['fix bug 12']
+    assert [str(it) for it in textobjects.findall(textobjects.create('Pair', '<a> <b>'), 'x y z w')] == [
+        'x y', 'y z', 'z w']
+    assert len(textobjects.findall(textobjects.create('Pair', '<a> <b>', backend='regex'), 'x y z w')) == 2
+
+def test_concurrent_rescans_do_not_exhaust_the_io_pool(tmp_path):
+    import asyncio
+    from textobjects import aio, storage
+    Todo = textobjects.create('Todo', 'TODO: <item:.*>$')
+    for i in range(3):
+        (tmp_path / f'{i}.txt').write_text(f'TODO: {i}\n')
+    stores = [storage.TextObjectDirectoryTree([Todo], tmp_path / '0.txt', tmp_path, '*.txt')
+              for _ in range(aio.IO_WORKERS * 2)]
+    async def rescan():
+        await asyncio.wait_for(asyncio.gather(*[st.aupdate() for st in stores]), 10)
+    asyncio.run(rescan())
+    assert all(sorted(str(it) for it in st) == ['TODO: 0', 'TODO: 1', 'TODO: 2'] for st in stores)
+
+def test_star_import_exports_collections():
+    namespace = {}
+    exec('from textobjects import *', namespace)
+    assert namespace['Page'] is textobjects.collections.Page
+    assert all(name in namespace for name in ('glob', 'open', 'Document', 'create', 'findall'))
+
+def test_errors_in_interpolation_are_not_failures():
+    import pytest
+    Broken = textobjects.create('Broken', r'<key:\w+>`={"n": undefined}`', backend='nodes')
+    with pytest.raises(NameError):
+        textobjects.findall(Broken, 'a b')
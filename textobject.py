@@ -1,8 +1,14 @@
-from textobjects import templates
+import copyreg
+import weakref
+from abc import ABCMeta
 from dataclasses import dataclass
 from typing import Iterable
 from collections import UserString, UserList
 
+TRANSIENT = ('enclosing_text', 'matchobject', 'matches', 'matchdict', 'context')
+"""attributes of a TextObject which are not pickled, the spans are kept
+so the object can still be located in the text it came from"""
+
 @dataclass
 class TextObject:
     """Base class for a TextObject"""
@@ -14,8 +20,18 @@ class TextObject:
     """the index within the `enclosing_text` at which the `data` starts"""
     end: int
     """the index within the `enclosing_text` at which the `data` ends"""
-    others = []
+    others = ()
     """items which were found while matching the TextObject, but are not named"""
+    keepmatches = True
+    """whether each match keeps the `matches` and `matchdict` which were recorded
+    while it was matched. Set it to False on a textobject class whose results are
+    not used for backreferences, so that a match does not keep every sub-object
+    of the match alive"""
+
+    @property
+    def span(self):
+        """the (start, end) of the `data` within the `enclosing_text`"""
+        return (self.start, self.end)
 
     @classmethod
     def from_regex_match(cls, match, ctx):
@@ -38,6 +54,15 @@ class TextObject:
                 str(self.start) + 
                 str(self.end)))
 
+    def __reduce__(self):
+        state = {k: v for k, v in self.__dict__.items() if k not in TRANSIENT}
+        return (_restore, (type(self),), state)
+
+def _restore(cls):
+    obj = object.__new__(cls)
+    obj.enclosing_text = None
+    return obj
+
 class StructuredText(TextObject, UserString): 
     """A TextObject which is also a string"""
 
@@ -57,6 +82,61 @@ class ListTextObject(TextObject, UserList):
     """A TextObject which is also a list"""
     ...
 
+class TemplateMeta(ABCMeta):
+    """The metaclass of the classes created from templates. A class which
+    was passed to :func:`register` is pickled by reference to it's template,
+    and the classes of it's attributes by reference to that class"""
+
+_registry = weakref.WeakValueDictionary()
+
+def register(cls, template, backend, memoize=None, subclasses=()):
+    """record that `cls` was created from the template, so that it can be
+    pickled and recreated in another process
+
+    Args:
+        cls (TemplateMeta): the class created from the template
+        template (str): the template string
+        backend (str): the backend which created the class, see :func:`textobjects.create`
+        memoize (int): the memoize option the class was created with
+        subclasses (Iterable[Tuple[tuple, type]]): the classes of the attributes, with
+            a path which identifies each one within the template
+
+    Returns:
+        (TemplateMeta) the class
+    """
+    cls.__template__ = template
+    cls.__backend__ = backend
+    cls.__memoize__ = memoize
+    cls.__templateclasses__ = {}
+    for path, subcls in subclasses:
+        subcls.__owner__ = cls
+        subcls.__templatepath__ = path
+        cls.__templateclasses__[path] = subcls
+    _registry[(cls.__name__, template, backend, memoize)] = cls
+    return cls
+
+def _templateclass(name, template, backend, memoize):
+    """the registered class for the template, created if there is not one.
+    A class which is created again has no `post`, `construct` or `scope`"""
+    cls = _registry.get((name, template, backend, memoize))
+    if cls is None:
+        from textobjects.lib import create
+        cls = create(name, template, backend=backend, memoize=memoize)
+    return cls
+
+def _attributeclass(owner, path):
+    return owner.__templateclasses__[path]
+
+def _reduce_class(cls):
+    attrs = cls.__dict__
+    if attrs.get('__owner__') is not None:
+        return _attributeclass, (attrs['__owner__'], attrs['__templatepath__'])
+    if '__template__' in attrs:
+        return _templateclass, (cls.__name__, cls.__template__, cls.__backend__, cls.__memoize__)
+    return cls.__qualname__
+
+copyreg.pickle(TemplateMeta, _reduce_class)
+
 def textobjecttypes(cls=TextObject):
     """returns a mapping from class names to classes for all 
     subclasses of TextObject"""